@@ -0,0 +1,134 @@
+"""Card rendering benchmark for food_compass.py.
+
+Renders a page of product cards two ways with Streamlit's AppTest harness
+and reports the number of elements sent to the frontend and the script
+run time:
+
+- per-element: the card body as the app used to emit it, one `st.write`
+  per nutrient and one `st.markdown` per allergen/label/country/category
+- single block: the card body pre-rendered by `foodcompass.render.card_html`
+  and emitted with one `st.markdown` call
+
+Network-dependent parts of the card (GPT analysis, recall lookup, image)
+are left out so only rendering is measured. Run from the repository root:
+
+    python benchmarks/bench_render.py [cards]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def per_element_page(root, cards):
+    import streamlit as st
+
+    for i in range(cards):
+        # Repeated in both pages: AppTest.from_function runs only the function's own source
+        p = {
+            "product_name": f"Product {i}", "brands": "Acme", "quantity": "200 g", "code": str(i),
+            "nutrition_grades": "c", "ecoscore_grade": "b", "ingredients_text": "Oats, sugar, palm oil, salt",
+            "nutriments": {"energy-kcal_100g": 450, "fat_100g": 18, "sugars_100g": 22, "salt_100g": 0.8,
+                           "proteins_100g": 7, "sodium_100g": 0.32, "potassium_100g": 300, "calcium_100g": 40},
+            "allergens_tags": ["en:gluten", "en:milk", "en:nuts"],
+            "labels_tags": ["en:organic", "en:vegetarian", "en:fair-trade"],
+            "countries_tags": ["en:france", "en:germany", "en:united-states", "en:spain"],
+            "categories_tags": ["en:snacks", "en:sweet-snacks", "en:biscuits", "en:cereal-bars"],
+        }
+        with st.container():
+            cols = st.columns([1, 3])
+            with cols[1]:
+                st.markdown(f"### 🥫 {p['product_name']}")
+                st.error("❌ Does NOT Match Dietary Preferences!")
+                st.error("⚠ High Sugars (> 20.0 g)")
+                st.markdown(f"*Brand:* [{p['brands']}](https://world.openfoodfacts.org/brand/{p['brands']})")
+                st.write(f"*Quantity:* {p['quantity']}")
+                st.write(f"*Barcode:* {p['code']}")
+                st.write("*Nutrition Grade:* 🟠 C 🍞")
+                st.write("*Eco-Score:* 🟡 B 🍂")
+                st.markdown("** Nutrition Facts (per 100g):")
+                n = p["nutriments"]
+                st.write(f"*Calories:* {n['energy-kcal_100g']:.0f} kcal")
+                st.write(f"*Fats:* {n['fat_100g']:.1f} g")
+                st.write(f"*Sugars:* {n['sugars_100g']:.1f} g")
+                st.write(f"*Salt:* {n['salt_100g']:.1f} g")
+                st.write(f"*Proteins:* {n['proteins_100g']:.1f} g")
+                st.write(f"*Sodium:* {n['sodium_100g']:.3f} g")
+                st.write(f"*Potassium:* {n['potassium_100g']:.0f} mg")
+                st.write(f"*Calcium:* {n['calcium_100g']:.0f} mg")
+                st.markdown("🌿 Ingredients:")
+                st.write(p["ingredients_text"])
+                for field, title in (("allergens_tags", "⚠ Allergens:"), ("labels_tags", "🔖 Labels:"),
+                                     ("countries_tags", "🌍 Countries Available:"),
+                                     ("categories_tags", "🏷 Categories:")):
+                    st.markdown(title)
+                    for tag in p[field]:
+                        st.markdown(tag.replace("en:", "").replace("-", " ").title(), unsafe_allow_html=True)
+            st.markdown("---")
+
+
+def single_block_page(root, cards):
+    import sys
+
+    import streamlit as st
+
+    sys.path.insert(0, root)
+    from foodcompass import render
+
+    st.markdown(render.CARD_CSS, unsafe_allow_html=True)
+    for i in range(cards):
+        p = {
+            "product_name": f"Product {i}", "brands": "Acme", "quantity": "200 g", "code": str(i),
+            "nutrition_grades": "c", "ecoscore_grade": "b", "ingredients_text": "Oats, sugar, palm oil, salt",
+            "nutriments": {"energy-kcal_100g": 450, "fat_100g": 18, "sugars_100g": 22, "salt_100g": 0.8,
+                           "proteins_100g": 7, "sodium_100g": 0.32, "potassium_100g": 300, "calcium_100g": 40},
+            "allergens_tags": ["en:gluten", "en:milk", "en:nuts"],
+            "labels_tags": ["en:organic", "en:vegetarian", "en:fair-trade"],
+            "countries_tags": ["en:france", "en:germany", "en:united-states", "en:spain"],
+            "categories_tags": ["en:snacks", "en:sweet-snacks", "en:biscuits", "en:cereal-bars"],
+        }
+        with st.container():
+            cols = st.columns([1, 3])
+            with cols[1]:
+                st.markdown(render.card_html(p, ["⚠ High Sugars (> 20.0 g)"], False, grade="c"),
+                            unsafe_allow_html=True)
+            st.markdown("---")
+
+
+def count_elements(node):
+    children = getattr(node, "children", None)
+    if not children:
+        return 1
+    return 1 + sum(count_elements(child) for child in children.values())
+
+
+def run_page(page, cards, runs=5):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_function(page, args=(ROOT, cards), default_timeout=120)
+    at.run()  # warm-up: imports and caches
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - start)
+    return count_elements(at._tree), min(times), at.exception
+
+
+def main():
+    cards = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f"Page of {cards} product cards")
+    results = {}
+    for label, page in (("per-element", per_element_page), ("single block", single_block_page)):
+        elements, best, exc = run_page(page, cards)
+        results[label] = (elements, best)
+        print(f"  {label:12} {elements:6d} elements  {best * 1000:8.1f} ms (best run)")
+        if exc:
+            print(f"  {label} raised: {exc[0].message[:200]}")
+    (before, t_before), (after, t_after) = results.values()
+    print(f"Elements: {before / after:.1f}x fewer, run time: {t_before / t_after:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Startup benchmark for food_compass.py.
+
+Reports the import cost of the libraries the app loads eagerly versus the
+ones it defers to first use, and of each ``foodcompass`` module on its own
+(via ``python -X importtime``), and the
+wall-clock time of a cold script run and of a rerun using Streamlit's
+AppTest harness.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py
+"""
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "food_compass.py")
+
+# Imported by foodcompass.app on every run: json via recall_store, numpy via
+# rules/product_index, PIL via image_cache
+EAGER_MODULES = ["streamlit", "requests", "json", "pandas", "numpy", "PIL"]
+# Imported only when the feature that needs them is used
+LAZY_MODULES = ["openai", "plotly.express", "matplotlib.pyplot"]
+# The shared package, one module at a time
+PACKAGE_MODULES = [
+    "foodcompass.off_client", "foodcompass.recall_store", "foodcompass.nhanes", "foodcompass.nhanes_store",
+    "foodcompass.nhanes_stats", "foodcompass.nhanes_clusters", "foodcompass.rules",
+    "foodcompass.nutriscore", "foodcompass.product_index", "foodcompass.image_cache", "foodcompass.render",
+    "foodcompass.app",
+]
+
+
+def import_time_us(module, cumulative=True):
+    # Import time of `module` in a fresh interpreter, in microseconds: with its
+    # dependencies (cumulative) or of the module's own body only
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        return None
+    total = None
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = [x.strip() for x in line[len("import time:"):].split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            total = int(parts[1] if cumulative else parts[0])
+    return total
+
+
+def run_app(runs=5):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    start = time.perf_counter()
+    at.run()
+    cold = time.perf_counter() - start
+
+    reruns = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        at.run()
+        reruns.append(time.perf_counter() - start)
+    return cold, reruns, at.exception
+
+
+def main():
+    os.chdir(ROOT)
+
+    print("Import time (cumulative, fresh interpreter)")
+    for label, modules in (("eager", EAGER_MODULES), ("lazy", LAZY_MODULES)):
+        for module in modules:
+            us = import_time_us(module)
+            shown = "not installed" if us is None else f"{us / 1000:8.1f} ms"
+            print(f"  [{label:5}] {module:20} {shown}")
+
+    print()
+    print("foodcompass modules (fresh interpreter)       self   cumulative")
+    for module in PACKAGE_MODULES:
+        own, total = import_time_us(module, cumulative=False), import_time_us(module)
+        if own is None or total is None:
+            print(f"  {module:40} failed to import")
+        else:
+            print(f"  {module:40} {own / 1000:8.1f} ms {total / 1000:8.1f} ms")
+
+    cold, reruns, exc = run_app()
+    print()
+    print(f"Cold start:   {cold * 1000:8.1f} ms")
+    print(f"Rerun (best): {min(reruns) * 1000:8.1f} ms")
+    print(f"Rerun (mean): {sum(reruns) / len(reruns) * 1000:8.1f} ms")
+    if exc:
+        # e.g. no network access to the FDA API; timings still cover the run
+        print(f"Script raised: {exc[0].message[:200]}")
+
+
+if __name__ == "__main__":
+    main()
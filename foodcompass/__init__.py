@@ -0,0 +1,7 @@
+"""Food Compass core: Open Food Facts client, FDA recall store, NHANES
+statistics, nutrition rules and card rendering, shared by food_compass.py
+and the foodui entry points.
+
+Submodules are imported explicitly (``from foodcompass import app``) so an
+entry point only pays for the modules it uses.
+"""
@@ -0,0 +1,712 @@
+"""Streamlit views shared by food_compass.py and the foodui entry points.
+
+Each entry point sets up its page, calls `sidebar()` for the query settings
+and runs the views it offers. Data access lives in the sibling modules
+(`off_client`, `recall_store`, `nhanes`), scoring in `rules` and card
+markup in `render`.
+"""
+import pandas as pd
+import streamlit as st
+
+from . import image_cache
+from . import nhanes
+from . import nutriscore
+from . import off_client
+from . import product_index
+from . import recall_store
+from . import render
+from . import rules
+
+# Heavy clients and datasets are created on first use and cached for the
+# process, so a rerun that never reaches them does not pay for them.
+@st.cache_resource
+def get_openai_client():
+    from openai import OpenAI
+    api_key = st.secrets["OPENAI_API_KEY"]
+    return OpenAI(api_key=api_key)
+
+def analyze_nutrition_with_gpt(nutriments):
+    prompt = f"""
+    Analyze the following nutrition information (per 100g):
+    Calories: {nutriments.get("energy-kcal_100g", "N/A")},
+    Fats: {nutriments.get("fat_100g", "N/A")}g,
+    Sugars: {nutriments.get("sugars_100g", "N/A")}g,
+    Salt: {nutriments.get("salt_100g", "N/A")}g,
+    Proteins: {nutriments.get("proteins_100g", "N/A")}g.
+
+    Please evaluate the overall healthiness of this product and mention any specific concerns or benefits a health-conscious person should know.
+    """
+    try:
+        client = get_openai_client()
+        response = client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=150
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        return f"⚠️ GPT Analysis failed: {e}"
+
+
+# Diet profiles: built-in ones plus custom user profiles, e.g.
+# {"My Diet": [{"nutrient": "sugars_100g", "max": 8, "message": "⚠ Too sweet"}]}
+DIET_PROFILES_FILE = "diet_profiles.json"
+
+@st.cache_resource
+def load_diet_profiles(path=DIET_PROFILES_FILE):
+    # (profiles, errors); invalid user entries are skipped and reported in the sidebar
+    return rules.load_profiles(path)
+
+
+def diet_profiles():
+    return load_diet_profiles()[0]
+
+
+# Ingredient index over every product fetched by any session of this process
+@st.cache_resource
+def ingredient_index():
+    return product_index.IngredientIndex()
+
+
+# Nearest-neighbour indexes per searched category, for healthier alternatives
+@st.cache_resource
+def category_indexes():
+    return product_index.CategoryIndexes()
+
+
+# Optional product card sections; each entry point picks the ones it offers
+CARD_EXTRAS = ("recalls", "gpt", "nhanes", "thumbnails")
+
+
+# Sidebar: every query setting, returned as one dict for the views below
+def sidebar(header="Get Started", max_fats=50.0, max_sugars=20.0, max_salt=2.0, extras=CARD_EXTRAS):
+    st.sidebar.header(header)
+    settings = {"barcode": st.sidebar.text_input("Product Barcode", ""), "extras": tuple(extras)}
+
+    settings["fields"] = st.sidebar.multiselect(
+        "Fields to retrieve",
+        [
+            "product_name",
+            "nutrition_grades",
+            "ingredients_text",
+            "allergens_tags",
+            "labels_tags",
+            "misc_tags"
+        ],
+        default=["product_name", "nutrition_grades"]
+    )
+
+    # Dietary Preferences
+    for error in load_diet_profiles()[1]:
+        st.sidebar.warning(f"⚠ Diet profiles: {error}")
+    settings["dietary_preferences"] = st.sidebar.multiselect(
+        "Dietary Preference (Optional)",
+        list(diet_profiles())
+    )
+
+    # Custom Nutrition Thresholds
+    st.sidebar.markdown("*Custom Nutrition Thresholds (per 100g)*")
+    settings["thresholds"] = {
+        "Calories": st.sidebar.number_input("Max Calories (kcal)", value=500),
+        "Fats": st.sidebar.number_input("Max Fats (g)", value=max_fats),
+        "Sugars": st.sidebar.number_input("Max Sugars (g)", value=max_sugars),
+        "Salt": st.sidebar.number_input("Max Salt (g)", value=max_salt)
+    }
+
+    # Allergen-safe filter, applied to search results with product_index.TagIndex
+    settings["exclude_allergens"] = st.sidebar.multiselect(
+        "Exclude allergens", product_index.COMMON_ALLERGENS, format_func=product_index.tag_display
+    )
+    settings["require_labels"] = st.sidebar.multiselect(
+        "Require labels", product_index.COMMON_LABELS, format_func=product_index.tag_display
+    )
+    settings["ingredient_query"] = st.sidebar.text_input(
+        "Ingredients", "", placeholder="e.g. no palm oil, no E621, contains oats"
+    )
+    settings["alternatives_lower"] = st.sidebar.multiselect(
+        "Healthier alternatives should be lower in", product_index.LOWER_OPTIONS, default=["sugars", "salt"]
+    )
+
+    settings["operation"] = st.sidebar.radio(
+        "Operation", ["Fetch Product", "Search by Category", "Submit Missing Data"]
+    )
+
+    # Additional inputs
+    if settings["operation"] == "Search by Category":
+        st.sidebar.info("Please enter category in English, e.g. 'Orange Juice', 'Chocolate'.")
+        settings["category"] = st.sidebar.text_input("Category (e.g. Bread)", "")
+        settings["grade"] = st.sidebar.selectbox("Nutrition Grade (optional)", ["", "a", "b", "c", "d", "e"])
+        settings["sort_by"] = st.sidebar.selectbox("Sort results by", rules.SORT_OPTIONS)
+        settings["fetch_pages"] = st.sidebar.number_input(
+            "Result pages to fetch (100 products each)", min_value=1, max_value=10, value=1
+        )
+    elif settings["operation"] == "Submit Missing Data":
+        st.sidebar.text_input("User ID", "")
+        st.sidebar.text_input("Password", type="password")
+    settings.setdefault("sort_by", rules.SORT_OPTIONS[0])
+    return settings
+
+
+# Check Nutrition Warnings: diet profiles are data (rules.DIET_PROFILES
+# plus user profiles in DIET_PROFILES_FILE), compiled once per rule set
+def check_nutrition_warnings(nutriments, dietary_preferences, thresholds):
+    return rules.check_nutrition_warnings(nutriments, dietary_preferences, thresholds, diet_profiles())
+
+
+# Comparison mode: products picked on any card are kept in the session and
+# shown together as one sortable table
+def toggle_comparison(p, key):
+    compare = st.session_state.setdefault("compare", {})
+    if st.session_state.get(key):
+        compare[p.get("code")] = p
+    else:
+        compare.pop(p.get("code"), None)
+    st.session_state["compare_changed"] = True
+
+
+def add_to_comparison(products):
+    compare = st.session_state.setdefault("compare", {})
+    for p in products:
+        compare[p.get("code")] = p
+    st.session_state["compare_changed"] = True
+
+
+def clear_comparison():
+    st.session_state["compare"] = {}
+    for key in [k for k in st.session_state if str(k).startswith("compare_")]:
+        del st.session_state[key]
+
+
+# Widgets inside a fragment rerun only that fragment, not the whole script
+@st.fragment
+def display_comparison(dietary_preferences, thresholds, recalls=True):
+    st.session_state.pop("compare_changed", None)
+    products = list(st.session_state.get("compare", {}).values())
+    if not products:
+        return
+    nutriscore.annotate(products)
+    compiled = rules.compile_profiles(dietary_preferences, thresholds, diet_profiles())
+    table = rules.comparison_table(products, compiled)
+    if recalls:
+        table["Brand recalls"] = table["Brand"].map(recall_store.recall_counts(tuple(sorted(set(table["Brand"])))))
+
+    green, red = "background-color: #d4f4dd", "background-color: #f9d6d5"
+    styled = (
+        table.style.format(precision=1)
+        .highlight_min(subset=rules.LOWER_IS_BETTER, props=green)
+        .highlight_max(subset=rules.LOWER_IS_BETTER, props=red)
+        .highlight_max(subset=rules.HIGHER_IS_BETTER, props=green)
+        .highlight_min(subset=rules.HIGHER_IS_BETTER, props=red)
+        .map(lambda v: red if v > 0 else "", subset=["Warnings"])
+    )
+    if recalls:
+        styled = styled.map(lambda v: red if v > 1 else "", subset=["Brand recalls"])
+    with st.expander(f"⚖️ Comparing {len(products)} products", expanded=True):
+        st.dataframe(styled, hide_index=True, use_container_width=True)
+        st.button("Clear comparison", on_click=clear_comparison)
+
+
+# Helper function to display a product card
+def display_product_card(p, dietary_preferences, thresholds, nhanes_rank=None, category=None, image=None,
+                         alternatives_lower=("sugars", "salt"), extras=CARD_EXTRAS, position=0):
+    code = p.get("code", "Unknown")
+    brand = p.get("brands", "Unknown")
+    nutrition_grade = p.get("nutrition_grades", "Unknown")
+    categories = p.get("categories_tags", [])
+    image_url = p.get("image_small_url", "")
+    nutriments = p.get("nutriments", {})
+
+    warnings, matches_preference = check_nutrition_warnings(nutriments, dietary_preferences, thresholds)
+    recall_count = recall_store.lookup_recall_count(brand) if "recalls" in extras else 0
+
+    # Computed locally when OFF has not graded the product (nutriscore.annotate)
+    grade, score, grade_estimated, score_estimated = rules.nutriscore_grade(nutriscore.annotate([p])[0])
+    grade_note = " (estimated)" if grade_estimated else ""
+    score_note = " (estimated)" if score_estimated else ""
+    if grade is not None:
+        nutrition_grade = grade
+
+    # Compared with U.S. eating occasions of the same meal type (NHANES)
+    comparisons = []
+    if nutriments and "nhanes" in extras:
+        if nhanes_rank is None:
+            ranks = nhanes.nhanes_product_percentiles([p])
+            nhanes_rank = ranks[0] if ranks else None
+        if nhanes_rank is not None:
+            meal_code, percentiles = nhanes_rank
+            meals = f"U.S. {nhanes.NHANES_MEAL_MAP[meal_code].lower()}s" if meal_code else "U.S. eating occasions"
+            for name, label in (("Sodium (mg)", "sodium"), ("Fat (g)", "fat")):
+                if percentiles[name] == percentiles[name]:  # not NaN
+                    comparisons.append(f"<em>vs. Americans' meals:</em> more {label} than {percentiles[name]:.0f}% of {meals}")
+
+    with st.container():
+        cols = st.columns([1, 3])
+        with cols[0]:
+            # Served from the local thumbnail cache (bundled placeholder when missing)
+            if image is None and "thumbnails" in extras:
+                image = image_cache.thumbnails([image_url])[0]
+            elif image is None:
+                image = image_url or image_cache.PLACEHOLDER
+            st.image(image, width=100)
+        with cols[1]:
+            # The whole card body is one pre-rendered HTML element (render.card_html)
+            st.markdown(render.card_html(
+                p, warnings, matches_preference, recall_count, nutrition_grade, grade_note, score, score_note,
+                comparisons, analyze_nutrition_with_gpt(nutriments) if "gpt" in extras else None
+            ), unsafe_allow_html=True)
+            # Keyed by position too: codeless products all share code "Unknown"
+            key = f"compare_{position}_{code}"
+            st.checkbox("⚖️ Compare", value=code in st.session_state.get("compare", {}),
+                        key=key, on_change=toggle_comparison, args=(p, key))
+
+            # Similar products from the same searched category, lower in the chosen nutrients
+            keys = [category] if category else [c.split(":", 1)[-1] for c in reversed(categories)]
+            index = category_indexes().get(keys)
+            alternatives = index.alternatives(p, 3, alternatives_lower) if index is not None else []
+            if alternatives:
+                lower = " and ".join(alternatives_lower) or "nutrients"
+                with st.expander(f"🔄 Healthier alternatives (lower {lower})"):
+                    for alt in alternatives:
+                        n = alt.get("nutriments", {})
+                        st.write(
+                            f"**{alt.get('product_name', 'Unknown')}** ({alt.get('brands', 'Unknown')}, {alt.get('code')}): "
+                            f"{n.get('energy-kcal_100g', 0):.0f} kcal, {n.get('sugars_100g', 0):.1f} g sugars, "
+                            f"{n.get('salt_100g', 0):.2f} g salt"
+                        )
+
+        st.markdown("---")
+
+
+# Paging reruns only this fragment, with the products it was called with
+@st.fragment
+def display_search_page(products, compiled, category_tag, settings, page_size=20):
+    # The comparison panel sits outside this fragment; results persist, so a full rerun is cheap
+    if st.session_state.pop("compare_changed", False):
+        st.rerun()
+    page_number = st.number_input("Page Number", min_value=1,
+                                  max_value=max(1, (len(products) - 1) // page_size + 1), step=1, key="page_number")
+    start_idx = (page_number - 1) * page_size
+    end_idx = start_idx + page_size
+
+    sort_by = settings["sort_by"]
+    if sort_by == rules.SORT_OPTIONS[0]:
+        page = products[start_idx:end_idx]
+    else:
+        # Only the products up to this page are selected and sorted
+        order = rules.rank_products(products, sort_by, compiled, k=end_idx)
+        page = [products[i] for i in order[start_idx:end_idx]]
+    st.button("⚖️ Compare all products on this page", on_click=add_to_comparison, args=(page,))
+    extras = settings["extras"]
+    ranks = images = [None] * len(page)
+    if "nhanes" in extras:
+        ranks = nhanes.nhanes_product_percentiles(page) or ranks
+    if "thumbnails" in extras:
+        images = image_cache.thumbnails([p.get("image_small_url") for p in page])
+    for position, (p, rank, image) in enumerate(zip(page, ranks, images), start_idx):
+        display_product_card(p, settings["dietary_preferences"], settings["thresholds"], rank, category_tag, image,
+                             settings["alternatives_lower"], extras, position)
+
+
+# Fetched results are kept in the session per query, so paging, sorting and
+# filtering rerun on them without going back to Open Food Facts
+RESULT_CACHE_SIZE = 8
+
+
+def fetch_result(key):
+    # Result record for a query key, or None if the request failed
+    if key[0] == "product":
+        p = off_client.fetch_product(key[1], key[2])
+        if p is None:
+            return None
+        ingredient_index().add([p])
+        return {"product": p}
+
+    _, category_tag, grade, pages, fields = key
+    obj = off_client.search_products(off_client.search_params(category_tag, grade, fields), pages)
+    if obj is None:
+        return None
+    products = obj.get("products", [])
+    ingredient_index().add(products)
+    category_indexes().add(category_tag, products)
+    nutriscore.annotate(products)
+    return {"count": obj["count"], "products": products, "tags": product_index.TagIndex().add(products)}
+
+
+def cached_result(key):
+    results = st.session_state.setdefault("results", {})
+    if key not in results:
+        result = fetch_result(key)
+        if result is None:
+            return None
+        while len(results) >= RESULT_CACHE_SIZE:
+            results.pop(next(iter(results)))
+    else:
+        result = results.pop(key)
+    results[key] = result  # most recently used last
+    return result
+
+
+def display_search_results(result, category_tag, settings):
+    products = result["products"]
+    st.success(f"✅ Found {result['count']} products")
+
+    dietary_preferences, thresholds = settings["dietary_preferences"], settings["thresholds"]
+    exclude_allergens, require_labels = settings["exclude_allergens"], settings["require_labels"]
+    ingredient_query = settings["ingredient_query"]
+
+    if products and (exclude_allergens or require_labels):
+        # One bitwise pass over all fetched products
+        safe = result["tags"].filter(exclude_allergens, require_labels)
+        st.info(f"{int(safe.sum())} of {len(products)} fetched products pass your allergen and label filters.")
+        products = [p for p, ok in zip(products, safe) if ok]
+
+    if products and ingredient_query.strip():
+        index = ingredient_index()
+        wanted = index.matching_codes(ingredient_query)
+        st.info(f"{len(wanted)} of {len(index)} indexed products match '{ingredient_query}'.")
+        products = [p for p in products if p.get("code") in wanted]
+
+    if not products:
+        st.warning("⚠ No products found. Check spelling or try a different category.")
+        return
+
+    # Score every fetched product in one vectorized pass
+    compiled = rules.compile_profiles(dietary_preferences, thresholds, diet_profiles())
+    _, matches = compiled.evaluate(rules.nutrient_table(products, compiled.columns))
+    st.info(f"{int(matches.sum())} of {len(products)} fetched products match your dietary preferences.")
+
+    if st.toggle("Table view", key="table_view"):
+        display_search_table(products, compiled, settings["sort_by"], "recalls" in settings["extras"])
+    else:
+        display_search_page(products, compiled, category_tag, settings)
+
+
+# All results in one Arrow table, sortable and filterable in the browser
+def display_search_table(products, compiled, sort_by, recalls=True):
+    order = rules.rank_products(products, sort_by, compiled)
+    products = [products[i] for i in order]
+    table = rules.comparison_table(products, compiled, flags=True)
+    if recalls:
+        table.insert(table.columns.get_loc("Warning details") + 1, "Brand recalls",
+                     table["Brand"].map(recall_store.recall_counts(tuple(sorted(set(table["Brand"]))))))
+    st.dataframe(
+        table, hide_index=True, use_container_width=True, height=600,
+        column_config={
+            **{name: st.column_config.NumberColumn(format="%.1f") for name in rules.COMPARISON_NUTRIENTS.values()},
+            **{message: st.column_config.CheckboxColumn(message) for message in compiled.messages},
+        }
+    )
+
+
+# Nutrition checker: the Go button fetches (or reuses) a result; the last
+# successful query stays on screen across reruns
+def nutrition_checker(settings):
+    st.info("Use the sidebar to configure your query before searching.")
+    display_comparison(settings["dietary_preferences"], settings["thresholds"], "recalls" in settings["extras"])
+    if st.sidebar.button("Go"):
+        fields = tuple(sorted(settings["fields"]))
+        key = None
+        if settings["operation"] == "Fetch Product":
+            if not settings["barcode"].strip():
+                st.error("Please enter a barcode.")
+            else:
+                key = ("product", settings["barcode"].strip(), fields)
+        elif settings["operation"] == "Search by Category":
+            if not settings["category"].strip():
+                st.error("Please enter a category.")
+            else:
+                key = ("search", off_client.category_tag(settings["category"]), settings["grade"],
+                       int(settings["fetch_pages"]), fields)
+
+        st.session_state.pop("active_query", None)
+        if key is not None:
+            with st.spinner('Loading, please wait... 🌀'):
+                result = cached_result(key)
+            if result is None:
+                st.error("❌ Product not found or error." if key[0] == "product" else "❌ Search failed.")
+            else:
+                st.session_state["active_query"] = key
+                st.session_state.pop("page_number", None)
+
+    active = st.session_state.get("active_query")
+    if active is not None:
+        result = st.session_state["results"][active]
+        if active[0] == "product":
+            st.success("✅ Product found!")
+            display_product_card(result["product"], settings["dietary_preferences"], settings["thresholds"],
+                                 alternatives_lower=settings["alternatives_lower"], extras=settings["extras"])
+        else:
+            display_search_results(result, active[1], settings)
+
+
+# Recall map: the year filter reruns the map fragment, the state picker only
+# the details fragment inside it
+@st.fragment
+def recall_map_view():
+    st.header("🗺️ Food Recall Map")
+    selected_year = st.selectbox(
+        "Filter by Recall Year",
+        options=["All", "2025", "2024", "2023", "2022", "2021"],
+        index=0  # default is all
+    )
+
+    df_raw, state_counts = recall_store.recalls_by_year(selected_year)
+
+    fig = render.draw_map(state_counts)
+    st.plotly_chart(fig, use_container_width=True)
+
+    recall_state_details(df_raw, state_counts)
+
+
+@st.fragment
+def recall_state_details(df_raw, state_counts):
+    selected_state = st.selectbox("Select a state to view recall details", state_counts['state'])
+
+    st.subheader(f"📋 Recent Food Recalls in {selected_state}")
+    state_filtered = df_raw[df_raw['state'] == selected_state.upper()].head(10)
+
+    for _, row in state_filtered.iterrows():
+        st.markdown(f"""
+        **{row.get('product_description', 'No Description')}**  
+        - 🏢 **Firm:** {row.get('recalling_firm', 'N/A')}  
+        - ⚠️ **Reason:** {row.get('reason_for_recall', 'N/A')}  
+        - 🗓️ **Date:** {row.get('recall_initiation_date', 'N/A')}
+        """)
+        st.markdown("---")
+
+
+# U.S. eating habits: the nutrient picker reruns the view's fragment; meal/bin
+# choices, the weighted estimates and the cluster count rerun only their own
+@st.fragment
+def eating_habits_view():
+    import matplotlib.pyplot as plt
+
+    st.header("U.S. Eating Habits Overview")
+
+    try:
+        agg = nhanes.nhanes_meal_means(tuple(nhanes.NHANES_FILES))
+    except FileNotFoundError as e:
+        st.error(f"❌ File '{e.filename}' not found.")
+        return
+
+    # 
+    nutrient = st.selectbox("Select Nutrient to Display", ["Sodium (mg)", "Fat (g)"], key="meal_plot_nutrient")
+
+    # 
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.bar(agg["Meal Type"], agg[nutrient], color="#4c72b0")
+    ax.set_title(f"Average {nutrient} by Meal Type (NHANES)", fontsize=14)
+    ax.set_xlabel("Meal Type")
+    ax.set_ylabel(nutrient)
+    ax.grid(axis='y', linestyle='--', alpha=0.5)
+    plt.xticks(rotation=30)
+    plt.tight_layout()
+
+    # 
+    st.pyplot(fig)
+
+    # Spread per eating occasion, from the mergeable quantile sketches
+    st.subheader(f"Distribution of {nutrient} per Eating Occasion")
+    dist = nhanes.nhanes_meal_distribution(tuple(nhanes.NHANES_FILES))
+    dist = dist[dist["nutrient"] == nutrient].reset_index(drop=True)
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.bxp([
+        {
+            "label": row["Meal Type"], "mean": row["mean"], "med": row["p50"],
+            "q1": row["p25"], "q3": row["p75"], "whislo": row["p10"], "whishi": row["p90"], "fliers": []
+        }
+        for _, row in dist.iterrows()
+    ], showmeans=True, showfliers=False)
+    ax.scatter(range(1, len(dist) + 1), dist["p99"], marker="_", s=200, color="#c44e52", label="99th percentile")
+    ax.set_title(f"{nutrient} by Meal Type: p10, quartiles, p90 (NHANES)", fontsize=14)
+    ax.set_xlabel("Meal Type")
+    ax.set_ylabel(nutrient)
+    ax.grid(axis='y', linestyle='--', alpha=0.5)
+    ax.legend()
+    plt.xticks(rotation=30)
+    plt.tight_layout()
+    st.pyplot(fig)
+
+    dist["std"] = dist["variance"] ** 0.5
+    st.dataframe(
+        dist[["Meal Type", "count", "mean", "std", "p10", "p50", "p90", "p99"]].rename(columns={"p50": "median"}),
+        hide_index=True, use_container_width=True
+    )
+
+    binned_distribution_view(nutrient)
+    weighted_estimates_view(nutrient)
+
+    # Daily totals per participant against the guideline limit
+    st.subheader(f"Daily {nutrient} per Participant")
+    daily, shares = nhanes.nhanes_daily_totals(tuple(nhanes.NHANES_FILES))
+    limit = nhanes.NHANES_DAILY_LIMITS[nutrient]
+    over = (daily[nutrient] > limit).mean()
+    st.metric(f"Participant-days above the guideline limit ({limit:,})", f"{over:.0%}")
+
+    fig, axes = plt.subplots(1, 2, figsize=(12, 4.5))
+    axes[0].hist(daily[nutrient], bins=60, range=(0, daily[nutrient].quantile(0.99)), color="#4c72b0")
+    axes[0].axvline(limit, color="#c44e52", linestyle="--", label=f"Guideline limit ({limit:,})")
+    axes[0].set_title(f"Daily {nutrient} (NHANES)")
+    axes[0].set_xlabel(nutrient)
+    axes[0].set_ylabel("Participant-days")
+    axes[0].legend()
+    axes[1].barh(shares["Meal Type"], shares[nutrient] * 100, color="#55a868")
+    axes[1].invert_yaxis()
+    axes[1].set_title(f"Average Share of Daily {nutrient} by Meal Type")
+    axes[1].set_xlabel("% of daily intake")
+    for ax in axes:
+        ax.grid(axis='x', linestyle='--', alpha=0.5)
+    plt.tight_layout()
+    st.pyplot(fig)
+
+    eating_patterns_view()
+
+    with st.expander("About this data"):
+        st.markdown("""
+        This chart reflects **average nutrient intake per eating occasion** as reported
+        in **NHANES 2021-2023** (`DR1IFF_L.csv`).
+
+        1: "Breakfast"
+        2: "Lunch"
+        3: "Dinner"
+        4: "Supper"
+        5: "Brunch"
+        6: "Snack"
+        7: "Drink"
+        8: "Infant Feeding"
+        9: "Extended Consumption"
+
+        Meals are grouped by type (breakfast, lunch, dinner, snack), and show
+        the **average sodium (mg)** or **fat (g)** consumed per occasion.
+
+        The distribution chart shows the 10th/90th percentiles (whiskers),
+        quartiles (box), median, mean (triangle) and 99th percentile. Percentiles
+        come from streaming sketches and are accurate to about 1%.
+
+        Daily totals add up every eating occasion of a participant's recall
+        day and compare them with the Dietary Guidelines sodium limit
+        (2,300 mg) and the FDA Daily Value for total fat (78 g).
+
+        Eating patterns group participant-days by their meal-type mix, number
+        of eating occasions and sodium/fat per occasion.
+        """)
+
+
+
+# Interactive per-occasion distributions from precomputed bins
+@st.fragment
+def binned_distribution_view(nutrient):
+    import numpy as np
+    import plotly.graph_objects as go
+
+    st.subheader("Explore the Distribution per Eating Occasion")
+
+    binned = nhanes.nhanes_binned_distributions(tuple(nhanes.NHANES_FILES))
+    codes = {name: code for code, name in nhanes.NHANES_MEAL_MAP.items()}
+    cols = st.columns([3, 1])
+    with cols[0]:
+        selected_meals = st.multiselect(
+            "Meal types", list(nhanes.NHANES_MEAL_MAP.values()), default=list(nhanes.NHANES_MEAL_MAP.values()),
+            key="meal_plot_binned_meals"
+        )
+    with cols[1]:
+        resolution = st.select_slider("Bins", options=binned.resolutions, value=50, key="meal_plot_bins")
+    selected_codes = [codes[m] for m in selected_meals]
+    axis = 0 if nutrient == "Sodium (mg)" else 1
+
+    edges, counts, overflow = binned.histogram(selected_codes, axis, resolution)
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=edges[1] - edges[0],
+                           marker_color="#4c72b0"))
+    fig.update_layout(title=f"{nutrient} per Eating Occasion (NHANES)", xaxis_title=nutrient,
+                      yaxis_title="Eating occasions", bargap=0)
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"{overflow:,} occasions above {edges[-1]:,.0f} are not shown.")
+
+    resolution_2d = min(binned.resolutions_2d, key=lambda r: abs(r - resolution))
+    x_edges, y_edges, counts_2d = binned.histogram2d(selected_codes, resolution_2d)
+    fig = go.Figure(go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+        z=np.log10(counts_2d.T + 1), colorscale="Blues", zmin=0, colorbar={"title": "log10(occasions + 1)"}
+    ))
+    fig.update_layout(title="Sodium vs Fat per Eating Occasion (NHANES)",
+                      xaxis_title="Sodium (mg)", yaxis_title="Fat (g)")
+    st.plotly_chart(fig, use_container_width=True)
+
+
+# Population estimates with the day-one dietary sample weights
+@st.fragment
+def weighted_estimates_view(nutrient):
+    import matplotlib.pyplot as plt
+
+    if st.checkbox("Show survey-weighted population estimates (95% bootstrap CI)", key="meal_plot_weighted"):
+        with st.spinner("Resampling participants..."):
+            weighted = nhanes.nhanes_weighted_estimates(tuple(nhanes.NHANES_FILES), nhanes.NHANES_WEIGHTS_FILE)
+        if weighted is None:
+            st.info(
+                "No day-one dietary weights (WTDRD1) found. Use DR1IFF files that include them, "
+                "or point NHANES_WEIGHTS_FILE at the matching DR1TOT file."
+            )
+        else:
+            weighted = weighted[weighted["nutrient"] == nutrient].reset_index(drop=True)
+            fig, ax = plt.subplots(figsize=(8, 5))
+            ax.bar(weighted["Meal Type"], weighted["mean"], color="#4c72b0",
+                   yerr=[weighted["mean"] - weighted["mean low"], weighted["mean high"] - weighted["mean"]],
+                   capsize=4)
+            ax.set_title(f"Weighted Average {nutrient} by Meal Type (NHANES)", fontsize=14)
+            ax.set_xlabel("Meal Type")
+            ax.set_ylabel(nutrient)
+            ax.grid(axis='y', linestyle='--', alpha=0.5)
+            plt.xticks(rotation=30)
+            plt.tight_layout()
+            st.pyplot(fig)
+            st.dataframe(weighted.drop(columns="nutrient"), hide_index=True, use_container_width=True)
+
+
+# Eating-pattern clusters of participant-days
+@st.fragment
+def eating_patterns_view():
+    import matplotlib.pyplot as plt
+
+    st.subheader("Eating Patterns (MiniBatchKMeans clusters)")
+    n_clusters = st.slider("Number of patterns", min_value=2, max_value=10, value=5, key="meal_plot_clusters")
+    profiles = nhanes.nhanes_eating_patterns(tuple(nhanes.NHANES_FILES), n_clusters)
+    share_cols = [c for c in profiles.columns if c.startswith("share ")]
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    left = pd.Series(0.0, index=profiles.index)
+    colors = plt.get_cmap("tab10")
+    for i, col in enumerate(share_cols):
+        ax.barh(profiles["Cluster"], profiles[col] * 100, left=left, color=colors(i % 10), label=col[len("share "):])
+        left += profiles[col] * 100
+    ax.invert_yaxis()
+    ax.set_title("Meal-Type Mix of Each Eating Pattern", fontsize=14)
+    ax.set_xlabel("% of eating occasions")
+    ax.legend(bbox_to_anchor=(1.02, 1), loc="upper left", fontsize=8)
+    plt.tight_layout()
+    st.pyplot(fig)
+    st.dataframe(
+        profiles[["Cluster", "participant-days", "occasions", "sodium per occasion", "fat per occasion"]],
+        hide_index=True, use_container_width=True
+    )
+
+
+def about():
+    st.divider()
+    st.markdown("""
+### About Food Compass
+
+*App Purpose:*  
+> Food Compass helps you analyze nutrition facts of food products and aligns them with your dietary needs.
+> Food Compass is connected to Open Food Facts API service, for all terms, please check "https://world.openfoodfacts.org/api/v2/search"
+
+*Main Features:*  
+- Barcode and Category Search  
+- Nutrition Facts Detection  
+- ⚠ Dietary Warnings  
+- Summary Reports
+
+---
+
+> "Eat Smarter. Live Healthier." 🍎
+""")
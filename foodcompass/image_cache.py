@@ -0,0 +1,140 @@
+"""Local thumbnail cache for Open Food Facts product images.
+
+Images are fetched once (a page at a time, in a thread pool), downscaled to
+the card's display size and stored on disk as WebP (JPEG when Pillow lacks
+WebP support) under CACHE_DIR. The app serves the cached bytes itself, so
+browsers no longer fetch from third-party hosts. The least recently used
+files are evicted once the cache exceeds MAX_BYTES. Products without an
+image, or whose image cannot be fetched, get the bundled placeholder; a
+failed URL is not fetched again for FAILURE_TTL seconds.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import requests
+from PIL import Image, features
+
+CACHE_DIR = ".image_cache"
+MAX_BYTES = 64 * 1024 * 1024
+# Cards show images 100 px wide; twice that stays sharp on high-DPI screens
+THUMB_SIZE = (200, 200)
+FETCH_TIMEOUT = 10
+FETCH_WORKERS = 8
+FAILURE_TTL = 300
+PLACEHOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "no_image.png")
+
+FORMAT, EXTENSION = ("WEBP", ".webp") if features.check("webp") else ("JPEG", ".jpg")
+
+_evict_lock = threading.Lock()
+# url -> time.monotonic() of its last failed fetch
+_failed = {}
+_failed_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def placeholder():
+    with open(PLACEHOLDER, "rb") as f:
+        return f.read()
+
+
+def recently_failed(url, ttl=FAILURE_TTL):
+    with _failed_lock:
+        failed_at = _failed.get(url)
+        return failed_at is not None and time.monotonic() - failed_at < ttl
+
+
+def _mark_failed(url, ttl=FAILURE_TTL):
+    now = time.monotonic()
+    with _failed_lock:
+        for key in [key for key, failed_at in _failed.items() if now - failed_at >= ttl]:
+            del _failed[key]
+        _failed[url] = now
+
+
+def cache_path(url, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + EXTENSION)
+
+
+def downscale(data, size=THUMB_SIZE):
+    """Encoded thumbnail bytes of an image, no larger than `size`."""
+    with Image.open(io.BytesIO(data)) as im:
+        im = im.convert("RGB")
+        im.thumbnail(size)
+        out = io.BytesIO()
+        im.save(out, FORMAT, quality=80)
+    return out.getvalue()
+
+
+def cached(url, cache_dir=CACHE_DIR):
+    """Cached thumbnail bytes of `url`, or None. A hit marks the file as recently used."""
+    path = cache_path(url, cache_dir)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass  # evicted by another session since the read; the bytes are still good
+    return data
+
+
+def fetch(url, cache_dir=CACHE_DIR):
+    """Thumbnail bytes of `url`, fetched and stored on a cache miss; None if it fails."""
+    data = cached(url, cache_dir)
+    if data is not None or recently_failed(url):
+        return data
+    try:
+        res = requests.get(url, timeout=FETCH_TIMEOUT)
+        res.raise_for_status()
+        data = downscale(res.content)
+    except Exception:
+        _mark_failed(url)
+        return None
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(url, cache_dir)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return data
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    """Delete least recently used thumbnails until the cache fits in `max_bytes`."""
+    with _evict_lock:
+        try:
+            entries = [e for e in os.scandir(cache_dir) if e.name.endswith(EXTENSION)]
+        except FileNotFoundError:
+            return
+        stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def thumbnails(urls, cache_dir=CACHE_DIR, workers=FETCH_WORKERS):
+    """Image bytes for each URL (placeholder when missing), fetching misses in parallel."""
+    unique = list(dict.fromkeys(url for url in urls if url))
+    misses = [url for url in unique if not os.path.exists(cache_path(url, cache_dir)) and not recently_failed(url)]
+    found = {}
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(workers, len(misses))) as pool:
+            found.update(zip(misses, pool.map(lambda url: fetch(url, cache_dir), misses)))
+        evict(cache_dir)
+    for url in unique:
+        if url not in found:
+            found[url] = cached(url, cache_dir)
+    return [(found.get(url) if url else None) or placeholder() for url in urls]
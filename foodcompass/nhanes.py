@@ -0,0 +1,203 @@
+"""Cached NHANES queries behind the eating-habits view and product comparisons.
+
+Each query reads the columnar store (`nhanes_store`) once per process and is
+cached with Streamlit, so every entry point and session shares the results.
+Heavy modules are imported on first use.
+"""
+import pandas as pd
+import streamlit as st
+
+
+# NHANES eating occasions (DR1IFF)
+NHANES_MEAL_MAP = {
+    1: "Breakfast", 2: "Lunch", 3: "Dinner", 4: "Supper", 5: "Brunch",
+    6: "Snack", 7: "Drink", 8: "Infant Feeding", 9: "Extended Consumption"
+}
+# Individual foods files (CSV or SAS .xpt) combined in the eating-habits view,
+# e.g. DR1IFF and DR2IFF from several survey cycles
+NHANES_FILES = ["nhanes_small.csv"]
+# File with SEQN and WTDRD1 (e.g. DR1TOT_L.xpt) for files that lack the weight
+NHANES_WEIGHTS_FILE = None
+NHANES_NUTRIENT_NAMES = {"DR1ISODI": "Sodium (mg)", "DR1ITFAT": "Fat (g)"}
+
+
+# "How does this product compare to Americans' meals?": products are matched
+# to a meal type through their OFF categories (first match wins)
+PRODUCT_MEAL_TYPES = [
+    ("en:beverages", "Drink"),
+    ("en:breakfasts", "Breakfast"),
+    ("en:breakfast-cereals", "Breakfast"),
+    ("en:snacks", "Snack"),
+    ("en:desserts", "Snack"),
+    ("en:meals", "Dinner"),
+]
+
+
+@st.cache_resource
+def nhanes_percentile_index(paths=("nhanes_small.csv",)):
+    import numpy as np
+    from . import nhanes_stats
+    from . import nhanes_store
+
+    # Sorted per-meal-type occasion values, built once; group 0 holds every occasion
+    meals, values = [], []
+    for path in paths:
+        _, columns = nhanes_store.day_columns(path)
+        cols = nhanes_store.open_columns(path, columns)
+        meals.append(np.asarray(cols[columns[1]], dtype=np.intp))
+        values.append(np.column_stack([cols[c] for c in columns[2:]]))
+    meals, values = np.concatenate(meals), np.concatenate(values)
+    valid = (meals > 0) & (meals < nhanes_store.MEAL_CODES)
+    groups = np.concatenate([meals[valid], np.zeros(valid.sum(), dtype=np.intp)])
+    return {
+        name: nhanes_stats.PercentileIndex(
+            groups, np.concatenate([values[valid, j], values[valid, j]]), nhanes_store.MEAL_CODES
+        )
+        for j, name in enumerate(NHANES_NUTRIENT_NAMES.values())
+    }
+
+
+def product_meal_code(p):
+    categories = set(p.get("categories_tags", []) or [])
+    codes = {name: code for code, name in NHANES_MEAL_MAP.items()}
+    for tag, meal_type in PRODUCT_MEAL_TYPES:
+        if tag in categories:
+            return codes[meal_type]
+    return 0
+
+
+def _product_portion(nutriments, key):
+    # Per serving when OFF has it, otherwise a 100 g portion
+    value = nutriments.get(f"{key}_serving", None)
+    if value is None:
+        value = nutriments.get(f"{key}_100g", None)
+    return float("nan") if value is None else float(value)
+
+
+# Percentile of each product's sodium and fat among NHANES eating occasions of
+# its meal type, scored for the whole batch in one vectorized call.
+# Returns [(meal code, {nutrient: percentile})], or None without NHANES data.
+def nhanes_product_percentiles(products):
+    import numpy as np
+
+    try:
+        index = nhanes_percentile_index(tuple(NHANES_FILES))
+    except FileNotFoundError:
+        return None
+
+    groups = np.array([product_meal_code(p) for p in products], dtype=np.intp)
+    nutriments = [p.get("nutriments", {}) or {} for p in products]
+    sodium = np.array([_product_portion(n, "sodium") for n in nutriments])
+    salt = np.array([_product_portion(n, "salt") for n in nutriments])
+    portions = {
+        "Sodium (mg)": np.where(np.isnan(sodium), salt / 2.5, sodium) * 1000,
+        "Fat (g)": np.array([_product_portion(n, "fat") for n in nutriments]),
+    }
+    ranks = {name: index[name].percentiles(groups, portions[name]) for name in portions}
+    return [(g, {name: ranks[name][i] for name in ranks}) for i, g in enumerate(groups)]
+
+
+@st.cache_resource
+def nhanes_aggregate(paths=("nhanes_small.csv",)):
+    from . import nhanes_store
+
+    # Streamed in fixed-size chunks (in parallel for large inputs), so several
+    # full DR1IFF/DR2IFF files can be combined without loading them whole
+    return nhanes_store.aggregate_files(list(paths))
+
+
+@st.cache_data
+def nhanes_meal_means(paths=("nhanes_small.csv",)):
+    agg = nhanes_aggregate(paths).meal_means(NHANES_MEAL_MAP)
+    agg = agg.rename(columns=NHANES_NUTRIENT_NAMES)
+    return agg
+
+
+@st.cache_data
+def nhanes_meal_distribution(paths=("nhanes_small.csv",)):
+    dist = nhanes_aggregate(paths).meal_distribution(NHANES_MEAL_MAP)
+    dist["nutrient"] = dist["nutrient"].map(NHANES_NUTRIENT_NAMES)
+    return dist
+
+
+@st.cache_data
+def nhanes_weighted_estimates(paths=("nhanes_small.csv",), weights_path=None, n_boot=1000):
+    import numpy as np
+    from . import nhanes_stats
+    from . import nhanes_store
+
+    rows = nhanes_store.day_one_weighted_rows(list(paths), weights_path)
+    if rows is None:
+        return None
+    seqn, meal, values, weights = rows
+
+    frames = []
+    for j, name in enumerate(NHANES_NUTRIENT_NAMES.values()):
+        est, lower, upper = nhanes_stats.weighted_bootstrap(
+            seqn, meal, weights, values[:, j], nhanes_store.MEAL_CODES, qs=(0.5, 0.9), n_boot=n_boot
+        )
+        codes = [c for c in NHANES_MEAL_MAP if not np.isnan(est[c, 0])]
+        frame = pd.DataFrame({"Meal Type": [NHANES_MEAL_MAP[c] for c in codes], "nutrient": name})
+        for i, stat in enumerate(["mean", "median", "p90"]):
+            frame[stat] = est[codes, i]
+            frame[stat + " low"] = lower[codes, i]
+            frame[stat + " high"] = upper[codes, i]
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+# Guideline daily limits: Dietary Guidelines sodium limit, FDA Daily Value for fat
+NHANES_DAILY_LIMITS = {"Sodium (mg)": 2300, "Fat (g)": 78}
+
+
+@st.cache_data
+def nhanes_daily_totals(paths=("nhanes_small.csv",)):
+    import numpy as np
+    from . import nhanes_stats
+    from . import nhanes_store
+
+    # One row per participant and recall day; each file is one day of one cycle
+    totals, shares = [], []
+    for path in paths:
+        day, seqn, sums = nhanes_store.participant_sums(path, list(NHANES_MEAL_MAP))
+        day_totals, day_shares = nhanes_stats.totals_and_shares(sums)
+        frame = pd.DataFrame(day_totals, columns=list(NHANES_NUTRIENT_NAMES.values()))
+        frame.insert(0, "SEQN", seqn)
+        frame.insert(1, "day", day)
+        totals.append(frame)
+        shares.append(day_shares)
+
+    # Mean share of each meal type in a participant's daily intake
+    shares = np.concatenate(shares).mean(axis=0)
+    share_df = pd.DataFrame(
+        shares, columns=list(NHANES_NUTRIENT_NAMES.values()),
+        index=list(NHANES_MEAL_MAP.values()) + ["Other"]
+    ).rename_axis("Meal Type").reset_index()
+    return pd.concat(totals, ignore_index=True), share_df
+
+
+@st.cache_resource
+def nhanes_binned_distributions(paths=("nhanes_small.csv",)):
+    import numpy as np
+    from . import nhanes_stats
+    from . import nhanes_store
+
+    # Histograms of every meal type at every resolution, computed once; the
+    # charts below only receive bin counts
+    meals, sodium, fat = [], [], []
+    for path in paths:
+        _, columns = nhanes_store.day_columns(path)
+        cols = nhanes_store.open_columns(path, columns)
+        meals.append(cols[columns[1]])
+        sodium.append(cols[columns[2]])
+        fat.append(cols[columns[3]])
+    return nhanes_stats.BinnedDistributions(np.concatenate(meals), np.concatenate(sodium), np.concatenate(fat))
+
+
+@st.cache_data
+def nhanes_eating_patterns(paths=("nhanes_small.csv",), n_clusters=5):
+    from . import nhanes_clusters
+
+    # Fitted once and persisted on disk; refitted only when a source file changes
+    result = nhanes_clusters.load_or_fit(list(paths), NHANES_MEAL_MAP, n_clusters)
+    return nhanes_clusters.cluster_profiles(result)
@@ -0,0 +1,87 @@
+"""Eating-pattern clusters of NHANES participants.
+
+Each participant-day becomes a feature vector (meal-type mix of its eating
+occasions, sodium and fat per occasion, number of occasions), built from the
+streamed per-participant sums of `nhanes_store.participant_sums`. The vectors are
+clustered with scikit-learn's MiniBatchKMeans. The fitted model, scaler,
+features and labels are persisted with joblib next to the columnar store and
+reused across sessions until one of the source files changes.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import nhanes_stats
+from . import nhanes_store
+
+FEATURE_VERSION = 1  # bump when the features change, to invalidate saved models
+BATCH_SIZE = 4096
+
+
+def participant_features(paths, meal_map):
+    """DataFrame with SEQN, day and the feature columns, one row per participant-day."""
+    frames = []
+    for path in paths:
+        # The occasion-count column turns the meal-type shares into the occasion mix
+        day, keys, sums = nhanes_store.participant_sums(path, list(meal_map), counts=True, require_meal=True)
+        totals, shares = nhanes_stats.totals_and_shares(sums)
+        frame = pd.DataFrame({"SEQN": keys, "day": day, "occasions": totals[:, 0]})
+        frame["sodium per occasion"] = totals[:, 1] / totals[:, 0]
+        frame["fat per occasion"] = totals[:, 2] / totals[:, 0]
+        for i, name in enumerate(list(meal_map.values()) + ["Other"]):
+            frame[f"share {name}"] = shares[:, i, 0]
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _model_path(paths, n_clusters, meal_map):
+    stamps = [(os.path.abspath(p), nhanes_store.source_stamp(p)) for p in paths]
+    key = json.dumps([FEATURE_VERSION, n_clusters, sorted(meal_map.items()), stamps], sort_keys=True)
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    directory = os.path.join(os.path.dirname(nhanes_store.store_dir(paths[0])), "clusters")
+    return os.path.join(directory, f"{digest}.joblib")
+
+
+def fit_clusters(paths, meal_map, n_clusters=5, random_state=0):
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.preprocessing import StandardScaler
+
+    features = participant_features(paths, meal_map)
+    X = features.drop(columns=["SEQN", "day"]).to_numpy(np.float64)
+    # Counts and per-occasion amounts are heavy-tailed; shares are already 0..1
+    X[:, :3] = np.log1p(X[:, :3])
+    scaler = StandardScaler().fit(X)
+    model = MiniBatchKMeans(
+        n_clusters=n_clusters, batch_size=BATCH_SIZE, n_init=3, random_state=random_state
+    ).fit(scaler.transform(X))
+    return {"model": model, "scaler": scaler, "features": features, "labels": model.labels_}
+
+
+def load_or_fit(paths, meal_map, n_clusters=5):
+    """Saved clustering for `paths`, fitting and saving it if the data changed."""
+    import joblib
+
+    path = _model_path(paths, n_clusters, meal_map)
+    if os.path.exists(path):
+        try:
+            return joblib.load(path)
+        except Exception:
+            pass  # unreadable or from another library version: refit
+    result = fit_clusters(paths, meal_map, n_clusters)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(result, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return result
+
+
+def cluster_profiles(result):
+    """Size and mean feature values per cluster, largest cluster first."""
+    features = result["features"].drop(columns=["SEQN", "day"])
+    profiles = features.groupby(result["labels"]).mean()
+    profiles.insert(0, "participant-days", np.bincount(result["labels"], minlength=len(profiles)))
+    profiles = profiles.sort_values("participant-days", ascending=False)
+    profiles.index = [f"Pattern {i + 1}" for i in range(len(profiles))]
+    return profiles.rename_axis("Cluster").reset_index()
@@ -0,0 +1,365 @@
+"""Statistics for NHANES nutrient distributions.
+
+Moments and quantile sketches can be updated one chunk at a time and merged
+across chunks, worker processes and survey cycles, so distributions over the
+full individual foods files never need all rows in memory at once; so can
+per-participant daily sums. Survey-weighted bootstrap estimates work on
+whole column arrays.
+"""
+import os
+
+import numpy as np
+
+
+def moments(groups, values, n_groups):
+    """Count, mean and M2 (sum of squared deviations) of `values` per group."""
+    count = np.bincount(groups, minlength=n_groups)
+    total = np.bincount(groups, weights=values, minlength=n_groups)
+    mean = np.divide(total, count, out=np.zeros(n_groups), where=count > 0)
+    m2 = np.bincount(groups, weights=(values - mean[groups]) ** 2, minlength=n_groups)
+    return count, mean, m2
+
+
+def merge_moments(count_a, mean_a, m2_a, count_b, mean_b, m2_b):
+    """Combine two sets of per-group moments (Chan et al.'s form of Welford's update)."""
+    count = count_a + count_b
+    delta = mean_b - mean_a
+    safe = np.maximum(count, 1)
+    mean = mean_a + delta * count_b / safe
+    m2 = m2_a + m2_b + delta ** 2 * count_a * count_b / safe
+    return count, mean, m2
+
+
+class QuantileSketch:
+    """Per-group relative-error quantile sketch (DDSketch-style log buckets).
+
+    Values are counted in logarithmic buckets, so any quantile is returned
+    within `alpha` relative error and two sketches merge by adding their
+    counts. Values below `min_value` (including the 5.4e-79 SAS zeros in
+    NHANES files and any negatives) fall into a zero bucket; values above
+    `max_value` are clamped into the top bucket.
+    """
+
+    def __init__(self, n_groups, alpha=0.01, min_value=1e-2, max_value=1e6):
+        self.n_groups = n_groups
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = np.log(self.gamma)
+        self._offset = int(np.floor(np.log(min_value) / self._log_gamma))
+        top = int(np.ceil(np.log(max_value) / self._log_gamma))
+        self.min_value = min_value
+        # Bucket 0 is the zero bucket, bucket i > 0 covers (gamma^(k-1), gamma^k]
+        # with k = i + offset - 1
+        self.n_buckets = top - self._offset + 2
+        self.counts = np.zeros((n_groups, self.n_buckets), dtype=np.int64)
+
+    def _bucket(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        out = np.zeros(len(values), dtype=np.intp)
+        pos = values >= self.min_value
+        k = np.ceil(np.log(values[pos]) / self._log_gamma).astype(np.intp)
+        out[pos] = np.clip(k - self._offset + 1, 1, self.n_buckets - 1)
+        return out
+
+    def _value(self, buckets):
+        k = buckets + self._offset - 1
+        return np.where(buckets == 0, 0.0, 2 * self.gamma ** k / (self.gamma + 1))
+
+    def update(self, groups, values):
+        flat = np.asarray(groups, dtype=np.intp) * self.n_buckets + self._bucket(values)
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+        return self
+
+    def merge(self, other):
+        self.counts += other.counts
+        return self
+
+    def quantiles(self, group, qs):
+        """Approximate quantiles `qs` (0..1) of one group; NaN when it is empty."""
+        qs = np.asarray(qs, dtype=np.float64)
+        cum = np.cumsum(self.counts[group])
+        n = cum[-1] if len(cum) else 0
+        if n == 0:
+            return np.full(qs.shape, np.nan)
+        buckets = np.searchsorted(cum, qs * (n - 1), side="right")
+        return self._value(buckets)
+
+
+def segment_starts(keys):
+    """Start offsets of the runs of equal values in sorted `keys`."""
+    keys = np.asarray(keys)
+    if not len(keys):
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def participant_meal_sums(seqn, meal, values, meal_codes):
+    """Per-participant nutrient sums by meal type for one chunk of a recall day.
+
+    `values` is an (n, k) nutrient array. Rows are grouped by SEQN (sorted
+    first if the chunk is not; NHANES files already are) and summed with one
+    `np.bincount` per nutrient over combined (participant, meal) cells.
+    Returns (participants, sums of shape (p, len(meal_codes) + 1, k)), where
+    the last meal column collects codes not listed in `meal_codes`. Rows with
+    a missing SEQN or nutrient value are skipped.
+    """
+    seqn = np.asarray(seqn)
+    meal = np.asarray(meal, dtype=np.intp)
+    values = np.asarray(values, dtype=np.float64)
+    ok = (seqn > 0) & ~np.isnan(values).any(axis=1)
+    seqn, meal, values = seqn[ok], meal[ok], values[ok]
+    if len(seqn) and np.any(seqn[1:] < seqn[:-1]):
+        order = np.argsort(seqn, kind="stable")
+        seqn, meal, values = seqn[order], meal[order], values[order]
+
+    n_meals = len(meal_codes) + 1
+    lookup = np.full(max(list(meal_codes) + [int(meal.max(initial=0))]) + 1, n_meals - 1, dtype=np.intp)
+    lookup[list(meal_codes)] = np.arange(n_meals - 1)
+    starts = segment_starts(seqn)
+    participant = np.cumsum(np.r_[0, seqn[1:] != seqn[:-1]]) if len(seqn) else np.empty(0, dtype=np.intp)
+    cells = participant * n_meals + lookup[meal]
+    size = len(starts) * n_meals
+    sums = np.stack(
+        [np.bincount(cells, weights=values[:, j], minlength=size) for j in range(values.shape[1])], axis=-1
+    ) if values.shape[1] else np.zeros((size, 0))
+    return seqn[starts], sums.reshape(len(starts), n_meals, values.shape[1])
+
+
+def merge_participant_sums(parts):
+    """Combine `participant_meal_sums` results of several chunks of one day.
+
+    A participant split across a chunk boundary appears in two consecutive
+    parts; its rows are added up. Parts of a SEQN-sorted file are already in
+    order, so only unsorted inputs pay for a sort.
+    """
+    seqn = np.concatenate([p[0] for p in parts])
+    sums = np.concatenate([p[1] for p in parts])
+    if len(seqn) and np.any(seqn[1:] < seqn[:-1]):
+        order = np.argsort(seqn, kind="stable")
+        seqn, sums = seqn[order], sums[order]
+    starts = segment_starts(seqn)
+    if len(starts) == len(seqn):
+        return seqn, sums
+    return seqn[starts], np.add.reduceat(sums, starts, axis=0)
+
+
+def totals_and_shares(sums):
+    """(totals of shape (p, k), meal-type shares of shape (p, meals, k)) from meal sums.
+
+    A share is 0 when the participant's total is 0.
+    """
+    totals = sums.sum(axis=1)
+    shares = np.divide(sums, totals[:, None, :], out=np.zeros_like(sums), where=totals[:, None, :] > 0)
+    return totals, shares
+
+
+def daily_totals(seqn, meal, values, meal_codes):
+    """Per-participant nutrient totals and meal-type shares from one recall day.
+
+    Returns (participants, totals of shape (p, k), shares of shape
+    (p, len(meal_codes) + 1, k)); see `participant_meal_sums`.
+    """
+    seqn, sums = participant_meal_sums(seqn, meal, values, meal_codes)
+    return (seqn, *totals_and_shares(sums))
+
+
+# --- Survey-weighted estimates with bootstrap confidence intervals ----------
+
+BOOTSTRAP_BATCH = 50
+BOOTSTRAP_CELLS = 5_000_000  # replicates x rows per batch, bounds batch memory
+BOOTSTRAP_PARALLEL_CELLS = 50_000_000  # below this, worker start-up costs more than it saves
+
+# Worker-process state only; calls in the app process pass `data` explicitly
+_bootstrap_data = None
+
+
+def _set_bootstrap_data(data):
+    # Process pool initializer: the sorted rows are sent once per worker
+    global _bootstrap_data
+    _bootstrap_data = data
+
+
+def _weighted_stats(row_weights, data, qs):
+    """Weighted mean and quantiles per group for each row of `row_weights`.
+
+    `row_weights` is (reps, n) over rows sorted by (group, value); returns an
+    array of shape (reps, n_groups, 1 + len(qs)).
+    """
+    values, starts = data["values"], data["starts"]
+    ends = np.r_[starts[1:], len(values)]
+    out = np.full((row_weights.shape[0], len(starts), 1 + len(qs)), np.nan)
+    qs = np.asarray(qs)
+    for g, (s, e) in enumerate(zip(starts, ends)):
+        w = row_weights[:, s:e]
+        cum = np.cumsum(w, axis=1)
+        total = cum[:, -1]
+        ok = total > 0
+        out[ok, g, 0] = (w[ok] @ values[s:e]) / total[ok]
+        # First row whose cumulative weight reaches q * total
+        idx = (cum[:, :, None] < qs[None, None, :] * total[:, None, None]).sum(axis=1)
+        idx = np.minimum(idx, e - s - 1)
+        out[ok, g, 1:] = values[s:e][idx[ok]]
+    return out
+
+
+def _bootstrap_batch(seed, reps, qs, data=None):
+    if data is None:
+        data = _bootstrap_data
+    rng = np.random.default_rng(seed)
+    # Poisson(1) resampling of participants: equivalent to the multinomial
+    # bootstrap for large samples and independent across replicates/batches
+    multipliers = rng.poisson(1.0, size=(reps, data["n_participants"])).astype(np.float32)
+    return _weighted_stats(multipliers[:, data["participant"]] * data["weights"], data, qs)
+
+
+def weighted_bootstrap(participant, groups, weights, values, n_groups, qs=(0.5, 0.9),
+                       n_boot=1000, ci=0.95, seed=0, workers=None):
+    """Survey-weighted mean and quantiles per group with bootstrap intervals.
+
+    Participants (not rows) are resampled, so the intervals account for
+    several eating occasions of one person being correlated. Replicates run
+    in vectorized batches of up to BOOTSTRAP_BATCH, spread over a process pool
+    when `workers` > 1 (default: all cores for large inputs). Results are reproducible for a
+    given `seed` whatever the number of workers.
+
+    Returns (estimates, lower, upper), each of shape (n_groups, 1 + len(qs))
+    with the mean first; empty groups are NaN.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    participant, inverse = np.unique(np.asarray(participant), return_inverse=True)
+    groups = np.asarray(groups, dtype=np.intp)
+    values = np.asarray(values, dtype=np.float64)
+    order = np.lexsort((values, groups))
+    sorted_groups = groups[order]
+
+    # Empty groups get an empty slice, keeping the output aligned with group ids
+    starts = np.searchsorted(sorted_groups, np.arange(n_groups))
+    nonempty = np.r_[starts[1:], len(values)] > starts
+    data = {
+        "participant": inverse[order],
+        "n_participants": len(participant),
+        "weights": np.asarray(weights, dtype=np.float64)[order],
+        "values": values[order],
+        "starts": starts[nonempty],
+    }
+
+    estimates = np.full((n_groups, 1 + len(qs)), np.nan)
+    estimates[nonempty] = _weighted_stats(data["weights"][None, :], data, qs)[0]
+
+    batch = max(1, min(BOOTSTRAP_BATCH, BOOTSTRAP_CELLS // max(len(values), 1)))
+    batches = [batch] * (n_boot // batch)
+    if n_boot % batch:
+        batches.append(n_boot % batch)
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(values) * n_boot >= BOOTSTRAP_PARALLEL_CELLS else 1
+    if workers <= 1 or len(batches) <= 1:
+        reps = [_bootstrap_batch(s, n, qs, data) for s, n in zip(seeds, batches)]
+    else:
+        with ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_set_bootstrap_data, initargs=(data,)
+        ) as pool:
+            reps = list(pool.map(_bootstrap_batch, seeds, batches, [qs] * len(batches)))
+    reps = np.concatenate(reps)
+
+    lower = np.full_like(estimates, np.nan)
+    upper = np.full_like(estimates, np.nan)
+    tail = (1 - ci) / 2 * 100
+    lower[nonempty] = np.nanpercentile(reps, tail, axis=0)
+    upper[nonempty] = np.nanpercentile(reps, 100 - tail, axis=0)
+    return estimates, lower, upper
+
+
+class PercentileIndex:
+    """Sorted per-group value arrays answering "what share of group g is below x".
+
+    Built once; each lookup is a binary search (`np.searchsorted`), and
+    `percentiles` scores a whole batch with one search per distinct group.
+    """
+
+    def __init__(self, groups, values, n_groups):
+        groups = np.asarray(groups, dtype=np.intp)
+        values = np.asarray(values, dtype=np.float64)
+        ok = ~np.isnan(values)
+        groups, values = groups[ok], values[ok]
+        order = np.lexsort((values, groups))
+        self.values = values[order]
+        self.starts = np.searchsorted(groups[order], np.arange(n_groups + 1))
+
+    def percentiles(self, groups, xs):
+        """Percent (0-100) of each group's values strictly below x; NaN if unknown."""
+        groups = np.asarray(groups, dtype=np.intp)
+        xs = np.asarray(xs, dtype=np.float64)
+        out = np.full(len(xs), np.nan)
+        for g in np.unique(groups):
+            s, e = self.starts[g], self.starts[g + 1]
+            mask = (groups == g) & ~np.isnan(xs)
+            if e > s and mask.any():
+                out[mask] = np.searchsorted(self.values[s:e], xs[mask], side="left") / (e - s) * 100
+        return out
+
+
+class BinnedDistributions:
+    """Precomputed 1D and 2D histograms of two nutrients per group.
+
+    Counts are built once per resolution with `np.bincount` over combined
+    (group, bin) indices, so charts only ever receive bin counts and
+    switching groups, nutrient or resolution never touches the raw rows.
+    Bins span 0 to the `upper_quantile` of each nutrient; 1D histograms
+    report values above it separately, 2D histograms clip them into the
+    last bin.
+    """
+
+    def __init__(self, groups, x, y, resolutions=(25, 50, 100, 200), resolutions_2d=(25, 50, 100),
+                 upper_quantile=0.995):
+        groups = np.asarray(groups, dtype=np.intp)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        ok = ~(np.isnan(x) | np.isnan(y))
+        groups, x, y = groups[ok], np.maximum(x[ok], 0), np.maximum(y[ok], 0)
+
+        self.groups, position = np.unique(groups, return_inverse=True)
+        n = len(self.groups)
+        self.upper = (
+            float(np.quantile(x, upper_quantile)) if len(x) else 1.0,
+            float(np.quantile(y, upper_quantile)) if len(y) else 1.0,
+        )
+        self.resolutions = tuple(resolutions)
+        self.resolutions_2d = tuple(resolutions_2d)
+        self._hist = {}
+        self._hist_2d = {}
+        for r in set(self.resolutions) | set(self.resolutions_2d):
+            bx, by = self._bins(x, 0, r), self._bins(y, 1, r)
+            if r in self.resolutions:
+                for axis, b in ((0, bx), (1, by)):
+                    # Bin r holds the values above the upper edge
+                    self._hist[axis, r] = np.bincount(
+                        position * (r + 1) + b, minlength=n * (r + 1)
+                    ).reshape(n, r + 1)
+            if r in self.resolutions_2d:
+                flat = (position * r + np.minimum(bx, r - 1)) * r + np.minimum(by, r - 1)
+                self._hist_2d[r] = np.bincount(flat, minlength=n * r * r).reshape(n, r, r).astype(np.int32)
+
+    def _bins(self, values, axis, r):
+        upper = self.upper[axis] or 1.0
+        return np.minimum((values / upper * r).astype(np.intp), r)
+
+    def edges(self, axis, resolution):
+        return np.linspace(0, self.upper[axis], resolution + 1)
+
+    def _select(self, groups):
+        return np.isin(self.groups, list(groups))
+
+    def histogram(self, groups, axis, resolution):
+        """(edges, counts, overflow) for `axis` (0 = x, 1 = y) summed over `groups`."""
+        counts = self._hist[axis, resolution][self._select(groups)].sum(axis=0)
+        return self.edges(axis, resolution), counts[:-1], int(counts[-1])
+
+    def histogram2d(self, groups, resolution):
+        """(x edges, y edges, counts[x bin, y bin]) summed over `groups`."""
+        counts = self._hist_2d[resolution][self._select(groups)].sum(axis=0)
+        return self.edges(0, resolution), self.edges(1, resolution), counts
@@ -0,0 +1,372 @@
+"""Columnar on-disk store for NHANES dietary recall files.
+
+The first time a CSV or SAS transport (.xpt) file is opened, the requested
+columns are converted into one raw binary file per column plus a small JSON
+manifest. Later loads memory-map only the columns they ask for, so load time
+and RSS scale with the columns used rather than with the size of the source
+file.
+
+Aggregates over whole files (and over several files, e.g. DR1IFF/DR2IFF
+across survey cycles) are computed by streaming fixed-size row ranges of the
+memory-mapped columns through a process pool and merging the partials.
+"""
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from . import nhanes_stats
+
+STORE_DIRNAME = ".nhanes_cache"
+CHUNK_ROWS = 250_000
+
+# Compact on-disk dtypes; any other column is stored as float32. Integer
+# columns store 0 for missing or unparseable values (no valid SEQN or meal
+# code is 0).
+NHANES_DTYPES = {
+    "SEQN": "int32",
+    "DR1_030Z": "uint8",
+    "DR2_030Z": "uint8",
+}
+DEFAULT_DTYPE = "float32"
+
+# Serializes the check-and-convert in open_columns between threads (sessions)
+_convert_lock = threading.Lock()
+
+
+def column_dtype(column):
+    return np.dtype(NHANES_DTYPES.get(column, DEFAULT_DTYPE))
+
+
+def store_dir(path):
+    # The store lives next to its source: data/foo.csv -> data/.nhanes_cache/foo/
+    path = os.path.abspath(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path), STORE_DIRNAME, stem)
+
+
+def source_stamp(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, "manifest.json"), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def is_xport(path):
+    return path.lower().endswith(".xpt")
+
+
+def source_columns(path):
+    """Column names of a CSV or SAS transport file, without reading its rows."""
+    if is_xport(path):
+        with pd.read_sas(path, format="xport", iterator=True) as reader:
+            return list(reader.columns)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _iter_source_chunks(path, columns, chunk_rows):
+    if is_xport(path):
+        with pd.read_sas(path, format="xport", chunksize=chunk_rows) as reader:
+            for chunk in reader:
+                yield chunk[columns]
+    else:
+        with pd.read_csv(path, usecols=columns, chunksize=chunk_rows) as reader:
+            yield from reader
+
+
+def convert_file(path, columns, chunk_rows=CHUNK_ROWS):
+    """Write `columns` of the CSV or .xpt file at `path` to the columnar store.
+
+    The source is streamed in chunks of `chunk_rows`, so conversion memory is
+    bounded regardless of file size. Returns the new manifest.
+    """
+    directory = store_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    stamp = source_stamp(path)
+
+    # Per-writer temp names: concurrent writers (other processes) never share a file
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    handles = {col: open(os.path.join(directory, col + ".bin" + suffix), "wb") for col in columns}
+    rows = 0
+    try:
+        for chunk in _iter_source_chunks(path, columns, chunk_rows):
+            for col in columns:
+                values = pd.to_numeric(chunk[col], errors="coerce")
+                dtype = column_dtype(col)
+                if dtype.kind in "iu":
+                    values = values.fillna(0)
+                handles[col].write(values.to_numpy(dtype).tobytes())
+            rows += len(chunk)
+    finally:
+        for f in handles.values():
+            f.close()
+
+    for col in columns:
+        os.replace(os.path.join(directory, col + ".bin" + suffix), os.path.join(directory, col + ".bin"))
+
+    manifest = {
+        "source": stamp,
+        "rows": rows,
+        "columns": {col: column_dtype(col).str for col in columns},
+    }
+    with open(os.path.join(directory, "manifest.json" + suffix), "w") as f:
+        json.dump(manifest, f)
+    os.replace(os.path.join(directory, "manifest.json" + suffix), os.path.join(directory, "manifest.json"))
+    return manifest
+
+
+def open_columns(path, columns):
+    """Return {column: read-only memmap} for `columns` of the file at `path`.
+
+    The store is (re)built when it does not exist yet, when the source changed
+    since it was written, or when a requested column has not been converted.
+    """
+    directory = store_dir(path)
+    with _convert_lock:
+        manifest = _read_manifest(directory)
+        if manifest is None or manifest["source"] != source_stamp(path):
+            manifest = convert_file(path, list(columns))
+        elif any(col not in manifest["columns"] for col in columns):
+            manifest = convert_file(path, sorted(set(manifest["columns"]) | set(columns)))
+
+    rows = manifest["rows"]
+    out = {}
+    for col in columns:
+        dtype = np.dtype(manifest["columns"][col])
+        if rows == 0:
+            out[col] = np.empty(0, dtype=dtype)
+        else:
+            out[col] = np.memmap(os.path.join(directory, col + ".bin"), dtype=dtype, mode="r", shape=(rows,))
+    return out
+
+
+# --- Streaming aggregation --------------------------------------------------
+
+MEAL_CODES = 256  # every DR1_030Z/DR2_030Z value fits in a uint8
+NUTRIENTS = ("ISODI", "ITFAT")  # sodium (mg), fat (g), without the DR1/DR2 prefix
+PARALLEL_MIN_ROWS = 2_000_000
+
+
+def day_columns(path, nutrients=NUTRIENTS):
+    """(day, [SEQN, meal code, nutrient...] column names) for a DR1IFF or DR2IFF file."""
+    day = 2 if "DR2_030Z" in source_columns(path) else 1
+    prefix = f"DR{day}"
+    return day, ["SEQN", prefix + "_030Z"] + [prefix + n for n in nutrients]
+
+
+class NhanesAggregate:
+    """Mergeable per-meal-type sums and counts.
+
+    Statistics are indexed by meal code and include streaming moments and
+    one quantile sketch per nutrient. Rows with a missing SEQN, meal code or
+    nutrient value are skipped, like the `dropna` in the eating-habits chart.
+    Per-participant daily totals are streamed by `participant_sums`.
+    """
+
+    def __init__(self, nutrients=NUTRIENTS):
+        self.nutrients = tuple(nutrients)
+        k = len(self.nutrients)
+        self.meal_count = np.zeros(MEAL_CODES, dtype=np.int64)
+        self.meal_sum = np.zeros((MEAL_CODES, k))
+        self.meal_m2 = np.zeros((MEAL_CODES, k))
+        self.meal_sketch = [nhanes_stats.QuantileSketch(MEAL_CODES) for _ in range(k)]
+
+    def update(self, seqn, meal, values):
+        """Fold one chunk in: `values` is an (n, len(nutrients)) array."""
+        values = np.asarray(values, dtype=np.float64)
+        ok = (seqn > 0) & (meal > 0) & ~np.isnan(values).any(axis=1)
+        meal, values = meal[ok].astype(np.intp), values[ok]
+
+        chunk_count = np.bincount(meal, minlength=MEAL_CODES)
+        for j in range(values.shape[1]):
+            _, mean, m2 = nhanes_stats.moments(meal, values[:, j], MEAL_CODES)
+            self._merge_moments(j, chunk_count, mean, m2)
+            self.meal_sum[:, j] += np.bincount(meal, weights=values[:, j], minlength=MEAL_CODES)
+            self.meal_sketch[j].update(meal, values[:, j])
+        self.meal_count += chunk_count
+        return self
+
+    def merge(self, other):
+        other_mean = other.meal_sum / np.maximum(other.meal_count, 1)[:, None]
+        for j in range(len(self.nutrients)):
+            self._merge_moments(j, other.meal_count, other_mean[:, j], other.meal_m2[:, j])
+            self.meal_sketch[j].merge(other.meal_sketch[j])
+        self.meal_count += other.meal_count
+        self.meal_sum += other.meal_sum
+        return self
+
+    def _merge_moments(self, j, count, mean, m2):
+        # Must run before meal_count/meal_sum take in the new rows
+        own_mean = self.meal_sum[:, j] / np.maximum(self.meal_count, 1)
+        _, _, self.meal_m2[:, j] = nhanes_stats.merge_moments(
+            self.meal_count, own_mean, self.meal_m2[:, j], count, mean, m2
+        )
+
+    def meal_means(self, meal_map):
+        """DataFrame of occasion count and mean nutrients per mapped meal type."""
+        codes = [c for c in meal_map if self.meal_count[c]]
+        counts = self.meal_count[codes]
+        out = pd.DataFrame({"Meal Type": [meal_map[c] for c in codes], "count": counts})
+        for j, n in enumerate(self.nutrients):
+            out["DR1" + n] = self.meal_sum[codes, j] / counts
+        return out
+
+    def meal_distribution(self, meal_map, qs=(0.1, 0.25, 0.5, 0.75, 0.9, 0.99)):
+        """Long DataFrame of count, mean, variance and quantiles per meal type and nutrient."""
+        rows = []
+        for code, name in meal_map.items():
+            n = self.meal_count[code]
+            if not n:
+                continue
+            for j, nutrient in enumerate(self.nutrients):
+                row = {
+                    "Meal Type": name,
+                    "nutrient": "DR1" + nutrient,
+                    "count": n,
+                    "mean": self.meal_sum[code, j] / n,
+                    "variance": self.meal_m2[code, j] / (n - 1) if n > 1 else np.nan,
+                }
+                for q, value in zip(qs, self.meal_sketch[j].quantiles(code, qs)):
+                    row[f"p{round(q * 100)}"] = value
+                rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def _aggregate_range(path, columns, nutrients, start, stop):
+    # Runs in a worker process: memory-maps its own row range of the store
+    arrays = open_columns(path, columns)
+    seqn, meal = arrays[columns[0]][start:stop], arrays[columns[1]][start:stop]
+    values = np.column_stack([arrays[c][start:stop] for c in columns[2:]])
+    return NhanesAggregate(nutrients).update(seqn, meal, values)
+
+
+def aggregate_files(paths, nutrients=NUTRIENTS, chunk_rows=CHUNK_ROWS, workers=None):
+    """Stream every file in `paths` in `chunk_rows` row ranges and merge the results.
+
+    Files are converted to the columnar store first (once). Ranges are
+    aggregated in a process pool when `workers` > 1; by default all cores are
+    used once the inputs exceed PARALLEL_MIN_ROWS rows. Each task holds a
+    single range, so memory stays bounded by chunk size.
+    """
+    tasks = []
+    for path in paths:
+        _, columns = day_columns(path, nutrients)
+        rows = len(open_columns(path, columns)[columns[0]])
+        for start in range(0, rows, chunk_rows):
+            tasks.append((path, columns, tuple(nutrients), start, min(start + chunk_rows, rows)))
+
+    if workers is None:
+        total_rows = sum(t[4] - t[3] for t in tasks)
+        workers = (os.cpu_count() or 1) if total_rows >= PARALLEL_MIN_ROWS else 1
+
+    result = NhanesAggregate(nutrients)
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            result.merge(_aggregate_range(*task))
+        return result
+
+    # spawn rather than fork: the Streamlit server process is multi-threaded
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for future in as_completed([pool.submit(_aggregate_range, *task) for task in tasks]):
+            result.merge(future.result())
+    return result
+
+
+def _participant_range(path, columns, meal_codes, counts, require_meal, start, stop):
+    # Runs in a worker process (or inline): one row range of one file
+    arrays = open_columns(path, columns)
+    seqn, meal = arrays[columns[0]][start:stop], arrays[columns[1]][start:stop]
+    values = [arrays[c][start:stop] for c in columns[2:]]
+    if counts:
+        values.insert(0, np.ones(stop - start))
+    values = np.column_stack(values)
+    if require_meal:
+        valid = meal > 0
+        seqn, meal, values = seqn[valid], meal[valid], values[valid]
+    return nhanes_stats.participant_meal_sums(seqn, meal, values, meal_codes)
+
+
+def participant_sums(path, meal_codes, nutrients=NUTRIENTS, counts=False, require_meal=False,
+                     chunk_rows=CHUNK_ROWS, workers=None):
+    """Per-participant nutrient sums by meal type for one DR1IFF or DR2IFF file.
+
+    Streams `chunk_rows` row ranges of the columnar store (in a process pool
+    for large files, like `aggregate_files`) and merges the participants
+    that span range boundaries, so memory stays bounded by chunk size and
+    participant count. With `counts`, the first value column counts
+    occasions; with `require_meal`, rows without a meal code are skipped.
+    Returns (day, participants, sums of shape (p, len(meal_codes) + 1, k)).
+    """
+    day, columns = day_columns(path, nutrients)
+    rows = len(open_columns(path, columns)[columns[0]])
+    tasks = [(path, columns, tuple(meal_codes), counts, require_meal, start, min(start + chunk_rows, rows))
+             for start in range(0, rows, chunk_rows)]
+    if not tasks:
+        tasks = [(path, columns, tuple(meal_codes), counts, require_meal, 0, 0)]
+    if workers is None:
+        workers = (os.cpu_count() or 1) if rows >= PARALLEL_MIN_ROWS else 1
+
+    if workers <= 1 or len(tasks) <= 1:
+        parts = [_participant_range(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = list(pool.map(_participant_range, *zip(*tasks)))
+    return (day, *nhanes_stats.merge_participant_sums(parts))
+
+
+# --- Survey weights ---------------------------------------------------------
+
+WEIGHT_COLUMN = "WTDRD1"  # dietary day-one sample weight
+
+
+def day_one_weighted_rows(paths, weights_path=None, nutrients=NUTRIENTS):
+    """SEQN, meal codes, (n, k) nutrient values and day-one weights of `paths`.
+
+    Only DR1 (day-one) files are used. Weights come from the individual foods
+    file itself when it has a WTDRD1 column (DR1IFF does), otherwise from
+    `weights_path` (e.g. DR1TOT), joined on SEQN. Rows with a missing or zero
+    weight (incomplete recalls) are dropped. Returns None when no weights
+    are available.
+    """
+    parts = []
+    for path in paths:
+        day, columns = day_columns(path, nutrients)
+        if day != 1:
+            continue
+        if WEIGHT_COLUMN in source_columns(path):
+            cols = open_columns(path, columns + [WEIGHT_COLUMN])
+            weights = np.asarray(cols[WEIGHT_COLUMN], dtype=np.float64)
+        elif weights_path is not None:
+            cols = open_columns(path, columns)
+            weights = _join_weights(cols["SEQN"], weights_path)
+        else:
+            continue
+        values = np.column_stack([cols[c] for c in columns[2:]]).astype(np.float64)
+        ok = (cols["SEQN"] > 0) & (cols[columns[1]] > 0) & (weights > 0) & ~np.isnan(values).any(axis=1)
+        parts.append((np.asarray(cols["SEQN"])[ok], np.asarray(cols[columns[1]])[ok], values[ok], weights[ok]))
+
+    if not parts:
+        return None
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+def _join_weights(seqn, weights_path):
+    cols = open_columns(weights_path, ["SEQN", WEIGHT_COLUMN])
+    order = np.argsort(cols["SEQN"], kind="stable")
+    keys = np.asarray(cols["SEQN"])[order]
+    weights = np.asarray(cols[WEIGHT_COLUMN], dtype=np.float64)[order]
+    pos = np.clip(np.searchsorted(keys, seqn), 0, max(len(keys) - 1, 0))
+    if not len(keys):
+        return np.zeros(len(seqn))
+    # NaN weights fail the `> 0` filter, like unmatched participants
+    return np.where(keys[pos] == seqn, weights[pos], 0.0)
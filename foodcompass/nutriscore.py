@@ -0,0 +1,148 @@
+"""Local, vectorized Nutri-Score computation.
+
+Implements the original (2017) Nutri-Score algorithm, including the
+beverage, water, added-fat and cheese variants, over arrays of products.
+It fills in scores and grades for products where Open Food Facts does not
+ship `nutriscore_data`, for a whole page or bulk scan in one call.
+"""
+import numpy as np
+import pandas as pd
+
+# A product scores one point per threshold its value is strictly above
+ENERGY_KJ = [335, 670, 1005, 1340, 1675, 2010, 2345, 2680, 3015, 3350]
+SUGARS = [4.5, 9, 13.5, 18, 22.5, 27, 31, 36, 40, 45]
+SATURATED_FAT = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+SATURATED_FAT_RATIO = [10, 16, 22, 28, 34, 40, 46, 52, 58, 64]  # % of total fat, added fats
+SODIUM_MG = [90, 180, 270, 360, 450, 540, 630, 720, 810, 900]
+FIBRE = [0.9, 1.9, 2.8, 3.7, 4.7]
+PROTEIN = [1.6, 3.2, 4.8, 6.4, 8.0]
+FRUIT_VEG_PCT = [40, 60, 80]
+FRUIT_VEG = np.array([0, 1, 2, 5])  # points per FRUIT_VEG_PCT interval
+
+BEVERAGE_ENERGY_KJ = [0, 30, 60, 90, 120, 150, 180, 210, 240, 270]
+BEVERAGE_SUGARS = [0, 1.5, 3, 4.5, 6, 7.5, 9, 10.5, 12, 13.5]
+BEVERAGE_FRUIT_VEG = np.array([0, 2, 4, 10])  # points per FRUIT_VEG_PCT interval
+
+# Upper score bound of grades A-D; anything above is E
+FOOD_GRADES = [-1, 2, 10, 18]
+BEVERAGE_GRADES = [-np.inf, 1, 5, 9]  # A is reserved for water
+
+BEVERAGE_TAGS = {"en:beverages"}
+NON_BEVERAGE_TAGS = {"en:milks", "en:dairy-drinks", "en:plant-based-milks"}
+WATER_TAGS = {"en:waters", "en:spring-waters", "en:mineral-waters"}
+CHEESE_TAGS = {"en:cheeses"}
+FAT_TAGS = {"en:fats", "en:vegetable-oils", "en:olive-oils", "en:butters", "en:margarines"}
+
+FRUIT_VEG_KEYS = [
+    "fruits-vegetables-nuts_100g",
+    "fruits-vegetables-nuts-estimate_100g",
+    "fruits-vegetables-nuts-estimate-from-ingredients_100g",
+]
+
+
+def _points(values, thresholds):
+    return np.searchsorted(np.asarray(thresholds, dtype=np.float64), values, side="left")
+
+
+def _first(nutriments, keys):
+    for key, factor in keys:
+        value = nutriments.get(key)
+        if value is not None:
+            try:
+                return float(value) * factor
+            except (TypeError, ValueError):
+                pass
+    return np.nan
+
+
+def product_arrays(products):
+    """Columnar inputs of the algorithm (NaN when unknown) from OFF product dicts."""
+    rows = []
+    for p in products:
+        n = p.get("nutriments", {}) or {}
+        tags = set(p.get("categories_tags", []) or [])
+        rows.append({
+            "energy_kj": _first(n, [("energy-kj_100g", 1), ("energy_100g", 1), ("energy-kcal_100g", 4.184)]),
+            "sugars": _first(n, [("sugars_100g", 1)]),
+            "saturated_fat": _first(n, [("saturated-fat_100g", 1)]),
+            "fat": _first(n, [("fat_100g", 1)]),
+            "sodium_mg": _first(n, [("sodium_100g", 1000), ("salt_100g", 400)]),
+            "fibre": _first(n, [("fiber_100g", 1)]),
+            "protein": _first(n, [("proteins_100g", 1)]),
+            "fruit_veg": _first(n, [(key, 1) for key in FRUIT_VEG_KEYS]),
+            "beverage": bool(tags & BEVERAGE_TAGS) and not tags & NON_BEVERAGE_TAGS,
+            "water": bool(tags & WATER_TAGS),
+            "cheese": bool(tags & CHEESE_TAGS),
+            "fat_product": bool(tags & FAT_TAGS),
+        })
+    return pd.DataFrame(rows, columns=[
+        "energy_kj", "sugars", "saturated_fat", "fat", "sodium_mg", "fibre", "protein", "fruit_veg",
+        "beverage", "water", "cheese", "fat_product",
+    ])
+
+
+def compute(table):
+    """(scores, grades) arrays for a table shaped like `product_arrays`.
+
+    The score is NaN and the grade None when energy, sugars, saturated fat
+    or sodium is unknown; missing fibre and fruit/vegetable content count as
+    zero, as on Open Food Facts.
+    """
+    energy = table["energy_kj"].to_numpy(np.float64)
+    sugars = table["sugars"].to_numpy(np.float64)
+    sat_fat = table["saturated_fat"].to_numpy(np.float64)
+    fat = table["fat"].to_numpy(np.float64)
+    sodium = table["sodium_mg"].to_numpy(np.float64)
+    fibre = np.nan_to_num(table["fibre"].to_numpy(np.float64))
+    protein = np.nan_to_num(table["protein"].to_numpy(np.float64))
+    fruit_veg = np.nan_to_num(table["fruit_veg"].to_numpy(np.float64))
+    beverage = table["beverage"].to_numpy(bool)
+    water = table["water"].to_numpy(bool)
+    cheese = table["cheese"].to_numpy(bool)
+    fat_product = table["fat_product"].to_numpy(bool)
+
+    ratio = np.divide(sat_fat * 100, fat, out=np.zeros_like(sat_fat), where=fat > 0)
+    sat_points = np.where(fat_product, _points(ratio, SATURATED_FAT_RATIO), _points(sat_fat, SATURATED_FAT))
+    energy_points = np.where(beverage, _points(energy, BEVERAGE_ENERGY_KJ), _points(energy, ENERGY_KJ))
+    sugar_points = np.where(beverage, _points(sugars, BEVERAGE_SUGARS), _points(sugars, SUGARS))
+    negative = energy_points + sugar_points + sat_points + _points(sodium, SODIUM_MG)
+
+    fv_interval = _points(fruit_veg, FRUIT_VEG_PCT)
+    fv_points = np.where(beverage, BEVERAGE_FRUIT_VEG[fv_interval], FRUIT_VEG[fv_interval])
+    fibre_points = _points(fibre, FIBRE)
+    protein_points = _points(protein, PROTEIN)
+
+    # Protein only counts when the product is not too unhealthy, unless it is
+    # cheese or has a high fruit/vegetable content
+    max_fv = np.where(beverage, 10, 5)
+    count_protein = (negative < 11) | (fv_points >= max_fv) | cheese
+    scores = negative - fibre_points - fv_points - np.where(count_protein, protein_points, 0)
+
+    known = ~(np.isnan(energy) | np.isnan(sugars) | np.isnan(sat_fat) | np.isnan(sodium))
+    scores = np.where(water & ~known, 0, scores)  # plain water is always A
+    grade_index = np.where(
+        beverage, _points(scores, BEVERAGE_GRADES), _points(scores, FOOD_GRADES)
+    )
+    grade_index = np.where(water, 0, grade_index)
+    grades = np.array(list("abcde"), dtype=object)[grade_index]
+    return np.where(known | water, scores, np.nan), np.where(known | water, grades, None)
+
+
+def annotate(products):
+    """Store locally computed scores on products lacking OFF Nutri-Score data.
+
+    Sets `nutriscore_local = {"score": int, "grade": "a".."e"}` on each
+    product dict (once; annotated products are skipped), so the result
+    travels and is cached with the product record. Returns `products`.
+    """
+    todo = [
+        p for p in products
+        if "nutriscore_local" not in p
+        and ((p.get("nutriscore_data") or {}).get("score") is None and p.get("nutriscore_score") is None
+             or str(p.get("nutrition_grades") or "").lower() not in ("a", "b", "c", "d", "e"))
+    ]
+    if todo:
+        scores, grades = compute(product_arrays(todo))
+        for p, score, grade in zip(todo, scores, grades):
+            p["nutriscore_local"] = None if grade is None else {"score": int(score), "grade": grade}
+    return products
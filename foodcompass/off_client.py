@@ -0,0 +1,80 @@
+"""Open Food Facts API client.
+
+One pooled HTTP session is shared by every entry point; search result pages
+are fetched concurrently.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+PRODUCT_URL = "https://world.openfoodfacts.org/api/v2/product/{barcode}"
+SEARCH_URL = "https://world.openfoodfacts.org/api/v2/search"
+
+# Always requested on top of the user's "Fields to retrieve"
+CARD_FIELDS = [
+    "brands", "quantity", "categories_tags", "ecoscore_grade",
+    "image_small_url", "countries_tags", "code", "nutriments", "nutriscore_data", "nutriscore_score",
+    "allergens_tags", "labels_tags", "ingredients_text"
+]
+
+MAX_WORKERS = 8
+
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS))
+
+
+def requested_fields(fields):
+    return ",".join(set(list(fields) + CARD_FIELDS))
+
+
+def category_tag(category):
+    return category.lower().replace(" ", "-").strip()
+
+
+def fetch_product(barcode, fields=()):
+    """Product dict for a barcode, or None if it is not found or the request fails."""
+    res = _session.get(PRODUCT_URL.format(barcode=barcode.strip()), params={"fields": requested_fields(fields)})
+    if res.ok and res.json().get("status") == 1:
+        return res.json()["product"]
+    return None
+
+
+def search_params(tag, grade="", fields=()):
+    params = {
+        "categories_tags_en": tag,
+        "fields": requested_fields(fields)
+    }
+    if grade:
+        params["nutrition_grades_tags"] = grade
+    return params
+
+
+def search_products(params, pages=1, page_size=100):
+    """Fetch `pages` pages of search results concurrently and concatenate them.
+
+    Returns the first page's JSON with all products, or None if it failed.
+    A product listed on several pages (OFF paging shifts while results
+    change) is kept once, at its first position.
+    """
+    def fetch(page):
+        return _session.get(SEARCH_URL, params={**params, "page": page, "page_size": page_size})
+
+    with ThreadPoolExecutor(max_workers=min(pages, MAX_WORKERS)) as pool:
+        responses = list(pool.map(fetch, range(1, pages + 1)))
+    if not responses[0].ok:
+        return None
+    obj = responses[0].json()
+    products, seen = [], set()
+    for res in responses:
+        if not res.ok:
+            continue
+        for p in res.json().get("products", []):
+            code = p.get("code")
+            if code:
+                if code in seen:
+                    continue
+                seen.add(code)
+            products.append(p)
+    obj["products"] = products
+    return obj
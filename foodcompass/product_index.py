@@ -0,0 +1,386 @@
+"""In-memory indexes over fetched Open Food Facts products.
+
+`TagIndex` maps every allergen/label tag to a bit position and stores each
+product's tags as a row of uint64 words, so "exclude milk, gluten, peanuts;
+require vegan" is one vectorized bitwise AND over the whole product set.
+
+`IngredientIndex` is an inverted index over normalized `ingredients_text`
+answering "no palm oil, no E621, contains oats" by intersecting postings
+instead of scanning every product's text.
+
+`CategoryIndexes` keeps a nearest-neighbour index per category over
+standardized nutrient vectors to suggest healthier alternatives.
+"""
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+TAG_FIELDS = ("allergens_tags", "labels_tags")
+
+COMMON_ALLERGENS = [
+    "en:milk", "en:gluten", "en:eggs", "en:peanuts", "en:nuts", "en:soybeans", "en:fish",
+    "en:crustaceans", "en:molluscs", "en:sesame-seeds", "en:celery", "en:mustard", "en:lupin",
+    "en:sulphur-dioxide-and-sulphites",
+]
+COMMON_LABELS = ["en:vegan", "en:vegetarian", "en:organic", "en:gluten-free", "en:no-lactose", "en:fair-trade"]
+
+
+def tag_display(tag):
+    return tag.replace("en:", "").replace("-", " ").title()
+
+
+class TagIndex:
+    """Bitset index of product tags, one bit per distinct (field, tag)."""
+
+    def __init__(self, fields=TAG_FIELDS):
+        self.fields = tuple(fields)
+        self.bits = {}
+        self.codes = []
+        self._masks = np.zeros((0, 1), dtype=np.uint64)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def masks(self):
+        return self._masks[:self._size]
+
+    def _bit(self, field, tag):
+        key = (field, tag)
+        bit = self.bits.get(key)
+        if bit is None:
+            bit = self.bits[key] = len(self.bits)
+        return bit
+
+    def add(self, products):
+        """Append products (OFF dicts); new tags get new bits as they appear."""
+        rows = []
+        for p in products:
+            bits = [self._bit(field, tag) for field in self.fields for tag in (p.get(field) or [])]
+            rows.append(np.asarray(bits, dtype=np.intp))
+            self.codes.append(p.get("code"))
+
+        words = max(self._masks.shape[1], (len(self.bits) + 63) // 64)
+        needed = self._size + len(rows)
+        if needed > self._masks.shape[0] or words > self._masks.shape[1]:
+            # Grow geometrically so repeated adds stay amortized O(1) per product
+            grown = np.zeros((max(needed, 2 * self._masks.shape[0]), words), dtype=np.uint64)
+            grown[:self._size, :self._masks.shape[1]] = self._masks[:self._size]
+            self._masks = grown
+
+        if rows:
+            lengths = np.fromiter((len(r) for r in rows), dtype=np.intp, count=len(rows))
+            all_bits = np.concatenate(rows) if lengths.sum() else np.empty(0, dtype=np.intp)
+            product_rows = np.repeat(np.arange(self._size, needed), lengths)
+            values = np.left_shift(np.uint64(1), (all_bits % 64).astype(np.uint64))
+            np.bitwise_or.at(self._masks, (product_rows, all_bits // 64), values)
+        self._size = needed
+        return self
+
+    def query_mask(self, field, tags):
+        """(mask words, all tags known) for a set of tags of one field."""
+        mask = np.zeros(self._masks.shape[1], dtype=np.uint64)
+        known = True
+        for tag in tags:
+            bit = self.bits.get((field, tag))
+            if bit is None:
+                known = False
+                continue
+            mask[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        return mask, known
+
+    def filter(self, exclude=(), require=(), exclude_field="allergens_tags", require_field="labels_tags"):
+        """Boolean array: products with none of `exclude` and all of `require`.
+
+        Products without any allergen tags count as free of every allergen,
+        as OFF lists an empty `allergens_tags` when none are declared.
+        """
+        masks = self.masks
+        ok = np.ones(len(masks), dtype=bool)
+        if exclude:
+            ex, _ = self.query_mask(exclude_field, exclude)
+            ok &= ~(masks & ex).any(axis=1)
+        if require:
+            req, known = self.query_mask(require_field, require)
+            if not known:
+                return np.zeros(len(masks), dtype=bool)
+            ok &= ((masks & req) == req).all(axis=1)
+        return ok
+
+
+# Ingredient lists: "Sugar, palm oil, flavouring (vanillin), E 621" splits into
+# the ingredients "sugar", "palm oil", "flavouring", "vanillin", "e621"
+INGREDIENT_SEPARATORS = re.compile(r"[,;:()\[\]{}.]|\s+-\s+|\band\b|\bet\b|\by\b|\bund\b")
+E_NUMBER = re.compile(r"\be[\s-]?(\d{3,4}[a-z]?)\b")
+WORD = re.compile(r"[a-z0-9]+")
+EXCLUDE_PREFIXES = ("no ", "not ", "without ", "free of ", "-")
+REQUIRE_PREFIXES = ("contains ", "with ", "has ", "+")
+
+
+def normalize(text):
+    """Lowercase, strip accents and join E-numbers ("E-621" -> "e621")."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return E_NUMBER.sub(r"e\1", text)
+
+
+def ingredients(text):
+    """Normalized ingredient names of an ingredients_text, sub-ingredients included."""
+    parts = (" ".join(WORD.findall(part)) for part in INGREDIENT_SEPARATORS.split(normalize(text or "")))
+    return [part for part in parts if part]
+
+
+def terms(phrase):
+    """Index terms of one ingredient: its words plus adjacent word pairs."""
+    words = phrase.split()
+    return set(words) | {a + " " + b for a, b in zip(words, words[1:])}
+
+
+def parse_query(query):
+    """("no palm oil, contains oats") -> (require phrases, exclude phrases)."""
+    require, exclude = [], []
+    for clause in normalize(query).split(","):
+        clause = clause.strip()
+        target = require
+        for prefix in EXCLUDE_PREFIXES:
+            if clause.startswith(prefix):
+                clause, target = clause[len(prefix):], exclude
+                break
+        else:
+            for prefix in REQUIRE_PREFIXES:
+                if clause.startswith(prefix):
+                    clause = clause[len(prefix):]
+                    break
+        phrase = " ".join(WORD.findall(clause))
+        if phrase:
+            target.append(phrase)
+    return require, exclude
+
+
+def _encode(doc_ids):
+    # Postings are sorted doc ids stored as gaps in the narrowest dtype that fits
+    gaps = np.diff(doc_ids, prepend=0)
+    dtype = np.uint8 if gaps.max(initial=0) < 2**8 else np.uint16 if gaps.max() < 2**16 else np.uint32
+    return gaps.astype(dtype)
+
+
+def _decode(postings):
+    return np.cumsum(postings, dtype=np.int64)
+
+
+class IngredientIndex:
+    """Inverted index from ingredient terms to products, over every product added.
+
+    Products are identified by barcode; re-adding a barcode is a no-op.
+    Postings are delta-encoded and only rebuilt for terms touched by an add.
+    """
+
+    def __init__(self):
+        self.codes = []
+        self.doc_ids = {}
+        self.postings = {}
+        self.has_text = np.zeros(0, dtype=bool)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def add(self, products):
+        with self._lock:
+            added = {}
+            flags = []
+            for p in products:
+                code = p.get("code")
+                if code is None or code in self.doc_ids:
+                    continue
+                doc = self.doc_ids[code] = len(self.codes)
+                self.codes.append(code)
+                text = p.get("ingredients_text")
+                flags.append(bool(text))
+                for term in set().union(*map(terms, ingredients(text))):
+                    added.setdefault(term, []).append(doc)
+            for term, docs in added.items():
+                old = self.postings.get(term)
+                docs = np.asarray(docs, dtype=np.int64)
+                self.postings[term] = _encode(docs if old is None else np.concatenate([_decode(old), docs]))
+            self.has_text = np.concatenate([self.has_text, np.asarray(flags, dtype=bool)])
+        return self
+
+    def docs(self, phrase):
+        """Sorted doc ids of products with an ingredient containing `phrase`."""
+        result = None
+        for term in sorted(terms(phrase), key=lambda t: -len(t.split())):
+            postings = self.postings.get(term)
+            if postings is None:
+                return np.empty(0, dtype=np.int64)
+            docs = _decode(postings)
+            result = docs if result is None else np.intersect1d(result, docs, assume_unique=True)
+        return np.empty(0, dtype=np.int64) if result is None else result
+
+    def search(self, require=(), exclude=()):
+        """Boolean array over doc ids; only products with ingredients can match."""
+        with self._lock:
+            ok = self.has_text.copy()
+            for phrase in require:
+                hit = np.zeros(len(ok), dtype=bool)
+                hit[self.docs(phrase)] = True
+                ok &= hit
+            for phrase in exclude:
+                ok[self.docs(phrase)] = False
+        return ok
+
+    def matching_codes(self, query):
+        require, exclude = parse_query(query)
+        ok = self.search(require, exclude)
+        return {code for code, hit in zip(self.codes, ok) if hit}
+
+
+# Nutrient vectors for "healthier alternatives": (name, OFF key, default when missing)
+ALTERNATIVE_FEATURES = [
+    ("kcal", "energy-kcal_100g", None),
+    ("fat", "fat_100g", None),
+    ("sugars", "sugars_100g", None),
+    ("salt", "salt_100g", None),
+    ("protein", "proteins_100g", None),
+    ("fibre", "fiber_100g", 0.0),
+]
+LOWER_OPTIONS = ["kcal", "fat", "sugars", "salt"]
+
+
+def nutrient_vector(p):
+    """Per-100g feature vector of a product, or None if a required value is missing."""
+    n = p.get("nutriments", {}) or {}
+    row = []
+    for _, key, default in ALTERNATIVE_FEATURES:
+        try:
+            value = float(n[key])
+        except (KeyError, TypeError, ValueError):
+            if default is None:
+                return None
+            value = default
+        row.append(value)
+    return row
+
+
+class NeighborIndex:
+    """k-NN index over standardized nutrient vectors of one category.
+
+    New products land in a small buffer that is searched by brute force;
+    the KDTree is rebuilt only once the buffer outgrows a fraction of it.
+    Until the first tree exists, the mean and scale follow every add, so
+    brute-force distances are standardized too.
+    """
+
+    REBUILD_FRACTION = 0.25
+    REBUILD_MIN = 32
+
+    def __init__(self):
+        self.products = []
+        self.codes = set()
+        self._values = np.empty((0, len(ALTERNATIVE_FEATURES)))
+        self._tree = None
+        self._built = 0
+        self._mean = np.zeros(len(ALTERNATIVE_FEATURES))
+        self._scale = np.ones(len(ALTERNATIVE_FEATURES))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.products)
+
+    def add(self, products):
+        with self._lock:
+            rows = []
+            for p in products:
+                code = p.get("code")
+                vector = nutrient_vector(p)
+                if code is None or code in self.codes or vector is None:
+                    continue
+                self.codes.add(code)
+                self.products.append(p)
+                rows.append(vector)
+            if rows:
+                self._values = np.vstack([self._values, np.asarray(rows)])
+            if len(self) - self._built > max(self.REBUILD_MIN, self.REBUILD_FRACTION * self._built):
+                self._rebuild()
+            elif rows and self._tree is None:
+                self._standardize()
+        return self
+
+    def _standardize(self):
+        self._mean = self._values.mean(axis=0)
+        self._scale = self._values.std(axis=0)
+        self._scale[self._scale == 0] = 1.0
+
+    def _rebuild(self):
+        from sklearn.neighbors import KDTree
+
+        self._standardize()
+        self._tree = KDTree((self._values - self._mean) / self._scale)
+        self._built = len(self)
+
+    def _nearest(self, point, k):
+        # Candidates from the tree plus the unindexed buffer, closest first
+        idx = np.empty(0, dtype=np.intp)
+        dist = np.empty(0)
+        if self._tree is not None and self._built:
+            d, i = self._tree.query(point[None, :], k=min(k, self._built))
+            idx, dist = i[0], d[0]
+        if self._built < len(self):
+            pending = (self._values[self._built:] - self._mean) / self._scale
+            idx = np.concatenate([idx, np.arange(self._built, len(self))])
+            dist = np.concatenate([dist, np.linalg.norm(pending - point, axis=1)])
+        order = np.argsort(dist, kind="stable")[:k]
+        return idx[order]
+
+    def alternatives(self, p, k=3, lower=("sugars", "salt")):
+        """Up to k products closest to `p` that are strictly lower in every `lower` nutrient."""
+        vector = nutrient_vector(p)
+        if vector is None:
+            return []
+        vector = np.asarray(vector)
+        columns = [name for name, _, _ in ALTERNATIVE_FEATURES]
+        lower = [columns.index(name) for name in lower]
+        with self._lock:
+            point = (vector - self._mean) / self._scale
+            n = min(4 * k + 1, len(self))
+            while True:
+                # Widen the search until k candidates satisfy the constraints
+                idx = self._nearest(point, n)
+                ok = (self._values[idx][:, lower] < vector[lower]).all(axis=1)
+                found = [self.products[i] for i in idx[ok] if self.products[i].get("code") != p.get("code")]
+                if len(found) >= k or n >= len(self):
+                    return found[:k]
+                n = min(2 * n, len(self))
+
+
+class CategoryIndexes:
+    """NeighborIndex per category, least recently used categories evicted first."""
+
+    def __init__(self, max_categories=32):
+        self.max_categories = max_categories
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, category, products):
+        with self._lock:
+            index = self._indexes.get(category)
+            if index is None:
+                index = self._indexes[category] = NeighborIndex()
+                while len(self._indexes) > self.max_categories:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(category)
+        return index.add(products)
+
+    def get(self, categories):
+        """Index of the first of `categories` that has one, else None."""
+        with self._lock:
+            for category in categories:
+                index = self._indexes.get(category)
+                if index is not None:
+                    self._indexes.move_to_end(category)
+                    return index
+        return None
@@ -0,0 +1,73 @@
+"""FDA food recall data: the local recall file and the openFDA enforcement API.
+
+Loaded data is cached for the process (Streamlit caches), so every entry
+point and session shares one copy.
+"""
+import json
+
+import pandas as pd
+import requests
+import streamlit as st
+
+RECALL_FILE = "food_recall_clean.json"
+ENFORCEMENT_URL = "https://api.fda.gov/food/enforcement.json"
+
+
+# Load recall_data.json; without the file no brand has recalls
+@st.cache_resource
+def load_recall_df(path=RECALL_FILE):
+    try:
+        with open(path, "r") as f:
+            recall_data = json.load(f)
+    except FileNotFoundError:
+        return pd.DataFrame({"recalling_firm": pd.Series(dtype=str)})
+
+    # Convert json to DataFrame
+    recall_df = pd.DataFrame(recall_data)
+
+    # Preprocess- delete all "dict"
+    for col in recall_df.columns:
+        recall_df[col] = recall_df[col].apply(lambda x: str(x) if isinstance(x, dict) else x)
+    return recall_df
+
+
+# Recall count per brand: recalls whose firm name contains the brand
+# (case-insensitive, literal match)
+@st.cache_data
+def recall_counts(brands):
+    firms = load_recall_df()["recalling_firm"].fillna("").astype(str).str.lower()
+    return {brand: int(firms.str.contains(str(brand).lower(), regex=False).sum()) for brand in brands}
+
+
+def lookup_recall_count(firm_name):
+    return recall_counts((firm_name,))[firm_name]
+
+
+# Fetch Food Recall Data
+@st.cache_data(ttl=3600)
+def get_recall_data():
+    params = {
+        "search": "status:Ongoing",
+        "limit": 1000
+    }
+    response = requests.get(ENFORCEMENT_URL, params=params)
+    if response.status_code == 200:
+        return response.json().get("results", [])
+    return []
+
+
+def process_data(data):
+    df = pd.DataFrame(data)
+    state_counts = df['state'].value_counts().reset_index()
+    state_counts.columns = ['state', 'count']
+    return df, state_counts
+
+
+@st.cache_data(ttl=3600)
+def recalls_by_year(selected_year):
+    df_raw, state_counts = process_data(get_recall_data())
+    if selected_year != "All":
+        df_raw = df_raw[df_raw['recall_initiation_date'].str.startswith(selected_year)]
+        state_counts = df_raw['state'].value_counts().reset_index()
+        state_counts.columns = ['state', 'count']
+    return df_raw, state_counts
@@ -0,0 +1,145 @@
+"""Server-side rendering of the product card body and the recall map.
+
+The card body is built as one HTML fragment and emitted with a single
+`st.markdown(..., unsafe_allow_html=True)` call instead of one Streamlit
+element per nutrient and tag. Static pieces (grade badges, tag chips, the
+stylesheet) are cached; everything taken from Open Food Facts is escaped.
+"""
+from functools import lru_cache
+from html import escape
+
+NUTRISCORE_BADGES = {'a': '🟢 A 🥦', 'b': '🟡 B 🍊', 'c': '🟠 C 🍞', 'd': '🟠 D 🍟', 'e': '🔴 E 🍩'}
+ECOSCORE_BADGES = {'a': '🟢 A 🌿', 'b': '🟡 B 🍂', 'c': '🟠 C 🍁', 'd': '🟠 D 🪵', 'e': '🔴 E 🔥'}
+
+# (OFF nutrient, label, format) in display order
+NUTRITION_FACTS = [
+    ("energy-kcal_100g", "Calories", "{:.0f} kcal"),
+    ("fat_100g", "Fats", "{:.1f} g"),
+    ("sugars_100g", "Sugars", "{:.1f} g"),
+    ("salt_100g", "Salt", "{:.1f} g"),
+    ("proteins_100g", "Proteins", "{:.1f} g"),
+    ("sodium_100g", "Sodium", "{:.3f} g"),
+    ("potassium_100g", "Potassium", "{:.0f} mg"),
+    ("calcium_100g", "Calcium", "{:.0f} mg"),
+]
+
+TAG_SECTIONS = [
+    ("allergens_tags", "⚠ Allergens"),
+    ("labels_tags", "🔖 Labels"),
+    ("countries_tags", "🌍 Countries Available"),
+    ("categories_tags", "🏷 Categories"),
+]
+
+CARD_CSS = """
+<style>
+.fc-card h3 { margin: 0 0 .4rem 0; }
+.fc-card p { margin: .15rem 0; }
+.fc-alert { border-radius: .5rem; padding: .45rem .75rem; margin: .3rem 0; }
+.fc-ok { background: rgba(33, 195, 84, .12); color: #177233; }
+.fc-bad { background: rgba(255, 43, 43, .09); color: #7d353b; }
+.fc-info { background: rgba(28, 131, 225, .1); color: #004280; }
+.fc-facts td { padding: .1rem .9rem .1rem 0; border: none; }
+.fc-chip { display: inline-block; border-radius: 1rem; padding: .05rem .6rem; margin: .1rem .2rem .1rem 0;
+           background: rgba(151, 166, 195, .2); font-size: .85rem; }
+</style>
+"""
+
+
+@lru_cache(maxsize=4096)
+def tag_chip(tag):
+    return f'<span class="fc-chip">{escape(tag.replace("en:", "").replace("-", " ").title())}</span>'
+
+
+@lru_cache(maxsize=64)
+def alert(kind, text):
+    return f'<div class="fc-alert fc-{kind}">{text}</div>'
+
+
+def _field(label, value):
+    return f"<p><em>{label}:</em> {value}</p>"
+
+
+def _number(value, fmt):
+    try:
+        return fmt.format(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def card_html(p, warnings, matches_preference, recall_count=0, grade=None, grade_note="",
+              score=None, score_note="", comparisons=(), analysis=None):
+    """HTML of the card body for an OFF product dict and its precomputed checks.
+
+    `comparisons` are extra lines under the nutrition facts (e.g. the NHANES
+    percentiles); `analysis` is the GPT text, shown when not None.
+    """
+    parts = ['<div class="fc-card">', f"<h3>🥫 {escape(str(p.get('product_name', 'Unknown')))}</h3>"]
+
+    if matches_preference:
+        parts.append(alert("ok", "✅ Matches Dietary Preferences!"))
+    else:
+        parts.append(alert("bad", "❌ Does NOT Match Dietary Preferences!"))
+        parts.extend(alert("bad", escape(w)) for w in warnings)
+    if recall_count > 1:
+        parts.append(alert("bad", f"⚠ High Recall Risk! ({recall_count} brand recalls found federally)"))
+
+    brand = p.get("brands", "Unknown")
+    if brand and brand != "Unknown":
+        brand_link = escape(f"https://world.openfoodfacts.org/brand/{brand.replace(' ', '-')}", quote=True)
+        parts.append(_field("Brand", f'<a href="{brand_link}" target="_blank">{escape(brand)}</a>'))
+    else:
+        parts.append(_field("Brand", escape(str(brand))))
+    parts.append(_field("Quantity", escape(str(p.get("quantity", "Unknown")))))
+    parts.append(_field("Barcode", escape(str(p.get("code", "Unknown")))))
+
+    if grade and grade != "Unknown":
+        badge = NUTRISCORE_BADGES.get(grade.lower()) or escape(grade.upper())
+        parts.append(_field("Nutrition Grade", f"{badge}{grade_note}"))
+        if score is not None:
+            parts.append(_field("Nutrition Score", f"{score:+d}{score_note}"))
+
+    ecoscore = p.get("ecoscore_grade", "Unknown")
+    if ecoscore and ecoscore != "Unknown":
+        parts.append(_field("Eco-Score", ECOSCORE_BADGES.get(ecoscore.lower()) or escape(ecoscore.upper())))
+
+    nutriments = p.get("nutriments", {})
+    if nutriments:
+        rows = []
+        for key, label, fmt in NUTRITION_FACTS:
+            value = _number(nutriments.get(key), fmt)
+            if value is not None:
+                rows.append(f"<tr><td><em>{label}:</em></td><td>{value}</td></tr>")
+        parts.append("<p><strong>Nutrition Facts (per 100g):</strong></p>")
+        parts.append(f'<table class="fc-facts">{"".join(rows)}</table>')
+        parts.extend(f"<p>{line}</p>" for line in comparisons)
+
+    if analysis is not None:
+        parts.append("<p>🧠 <strong>GPT-Based Nutrition Analysis:</strong></p>")
+        parts.append(alert("info", escape(analysis).replace("\n", "<br>")))
+
+    ingredients = p.get("ingredients_text") or "Not available"
+    parts.append(f"<p>🌿 Ingredients:</p><p>{escape(ingredients)}</p>")
+
+    for field, title in TAG_SECTIONS:
+        tags = p.get(field) or []
+        if tags:
+            parts.append(f"<p>{title}:</p><div>{''.join(map(tag_chip, tags))}</div>")
+
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def draw_map(state_counts):
+    """Choropleth of recall counts per U.S. state."""
+    import plotly.express as px
+
+    return px.choropleth(
+        state_counts,
+        locations='state',
+        locationmode="USA-states",
+        color='count',
+        scope="usa",
+        color_continuous_scale="Reds",
+        labels={'count': 'Recall Count'},
+        title="Food Recalls by State (Ongoing)"
+    )
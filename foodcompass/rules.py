@@ -0,0 +1,372 @@
+"""Diet-profile rule engine with vectorized evaluation over product tables.
+
+Diet profiles are plain data: each names a list of rules on OFF nutrient
+columns (per 100 g). The selected profiles plus the user's custom
+thresholds compile once into a threshold array and a column index, cached
+per distinct rule set, and then score a single product or a whole table
+with one vectorized comparison. Adding a diet means adding an entry to
+DIET_PROFILES or to a JSON profiles file; no code changes.
+
+A missing value never triggers a rule, matching the `is not None` checks of
+the original per-product `check_nutrition_warnings`.
+"""
+import json
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+NUTRIENT_COLUMNS = ["energy-kcal_100g", "fat_100g", "sugars_100g", "salt_100g"]
+
+# name -> rules; a rule warns when `nutrient` is above "max" (or below "min")
+DIET_PROFILES = {
+    "Low Carb": [
+        {"nutrient": "sugars_100g", "max": 10, "message": "⚠ High Carbs for Low Carb Diet"},
+    ],
+    "Low Fat": [
+        {"nutrient": "fat_100g", "max": 10, "message": "⚠ High Fat for Low Fat Diet"},
+    ],
+    "Low Sugar": [
+        {"nutrient": "sugars_100g", "max": 5, "message": "⚠ High Sugars for Low Sugar Diet"},
+    ],
+    "Low Salt": [
+        {"nutrient": "salt_100g", "max": 0.5, "message": "⚠ High Salt for Low Salt Diet"},
+    ],
+    "Keto": [
+        {"nutrient": "carbohydrates_100g", "max": 5, "message": "⚠ High Carbs for Keto Diet"},
+    ],
+    "DASH": [
+        {"nutrient": "salt_100g", "max": 0.3, "message": "⚠ High Salt for DASH Diet"},
+        {"nutrient": "saturated-fat_100g", "max": 1.5, "message": "⚠ High Saturated Fat for DASH Diet"},
+        {"nutrient": "sugars_100g", "max": 5, "message": "⚠ High Sugars for DASH Diet"},
+    ],
+    "Renal": [
+        {"nutrient": "salt_100g", "max": 0.3, "message": "⚠ High Salt for Renal Diet"},
+        {"nutrient": "potassium_100g", "max": 0.2, "message": "⚠ High Potassium for Renal Diet"},
+        {"nutrient": "phosphorus_100g", "max": 0.1, "message": "⚠ High Phosphorus for Renal Diet"},
+    ],
+    "High Protein": [
+        {"nutrient": "proteins_100g", "min": 10, "message": "⚠ Low Protein for High Protein Diet"},
+    ],
+}
+
+# Sidebar "Custom Nutrition Thresholds" key -> (nutrient, message)
+THRESHOLD_RULES = {
+    "Calories": ("energy-kcal_100g", "⚠ High Calories (> {limit} kcal)"),
+    "Fats": ("fat_100g", "⚠ High Fats (> {limit} g)"),
+    "Sugars": ("sugars_100g", "⚠ High Sugars (> {limit} g)"),
+    "Salt": ("salt_100g", "⚠ High Salt (> {limit} g)"),
+}
+
+
+def _rule_error(rule):
+    # Why a profile rule cannot be compiled, or None if it is valid
+    if not isinstance(rule, dict):
+        return "is not an object"
+    if not isinstance(rule.get("nutrient"), str) or not isinstance(rule.get("message"), str):
+        return 'needs a "nutrient" and a "message" string'
+    bounds = [key for key in ("max", "min") if key in rule]
+    if len(bounds) != 1:
+        return 'needs exactly one of "max" and "min"'
+    limit = rule[bounds[0]]
+    if isinstance(limit, bool) or not isinstance(limit, (int, float)):
+        return f'has a non-numeric "{bounds[0]}"'
+    return None
+
+
+def load_profiles(path, profiles=DIET_PROFILES):
+    """Built-in profiles updated with the valid user profiles of a JSON file.
+
+    Returns (profiles, errors): a missing file is not an error; an unreadable
+    file, a profile that is not a list of rules or a malformed rule is
+    skipped and described in `errors`, so one bad entry never breaks the app.
+    """
+    merged = dict(profiles)
+    errors = []
+    try:
+        with open(path, "r") as f:
+            user = json.load(f)
+    except FileNotFoundError:
+        return merged, errors
+    except (OSError, ValueError) as e:
+        return merged, [f"{path}: could not be read ({e})"]
+    if not isinstance(user, dict):
+        return merged, [f"{path}: expected an object mapping profile names to rule lists"]
+
+    for name, rules in user.items():
+        if not isinstance(rules, list):
+            errors.append(f'{path}: profile "{name}" is not a list of rules; skipped')
+            continue
+        valid = []
+        for i, rule in enumerate(rules):
+            error = _rule_error(rule)
+            if error:
+                errors.append(f'{path}: rule {i + 1} of profile "{name}" {error}; skipped')
+            else:
+                valid.append(rule)
+        if valid:
+            merged[name] = valid
+    return merged, errors
+
+
+def profile_rules(dietary_preferences, thresholds, profiles=DIET_PROFILES):
+    """Hashable rule set for the selected profiles followed by the threshold rules.
+
+    Each rule is (code, nutrient, sign, limit, message); sign is +1 for a
+    maximum and -1 for a minimum.
+    """
+    rules = []
+    for name, profile in profiles.items():
+        if name not in dietary_preferences:
+            continue
+        for rule in profile:
+            sign = 1 if "max" in rule else -1
+            limit = rule["max"] if sign > 0 else rule["min"]
+            rules.append((f"{name}:{rule['nutrient']}", rule["nutrient"], sign, float(limit), rule["message"]))
+    for key, (nutrient, message) in THRESHOLD_RULES.items():
+        if key in thresholds:
+            limit = thresholds[key]
+            rules.append((f"limit:{nutrient}", nutrient, 1, float(limit), message.format(limit=limit)))
+    return tuple(rules)
+
+
+class CompiledRules:
+    """A rule set compiled to a column index and signed threshold arrays."""
+
+    def __init__(self, rules):
+        self.codes = [r[0] for r in rules]
+        self.messages = np.array([r[4] for r in rules], dtype=object)
+        self.columns = list(dict.fromkeys(r[1] for r in rules))
+        position = {col: i for i, col in enumerate(self.columns)}
+        self.column_index = np.array([position[r[1]] for r in rules], dtype=np.intp)
+        self.sign = np.array([r[2] for r in rules], dtype=np.float64)
+        self.signed_limits = self.sign * np.array([r[3] for r in rules], dtype=np.float64)
+
+    def matrix(self, table):
+        """(n, len(columns)) float matrix of the columns the rules read."""
+        n = _table_length(table)
+        if not self.columns:
+            return np.empty((n, 0))
+        return np.column_stack([_column(table, col, n) for col in self.columns])
+
+    def violations(self, values):
+        # NaN compares False, so missing values never fire
+        return values[:, self.column_index] * self.sign > self.signed_limits
+
+    def evaluate(self, table):
+        """(violations DataFrame with one column per rule code, matches array)."""
+        mask = self.violations(self.matrix(table))
+        return pd.DataFrame(mask, columns=self.codes), ~mask.any(axis=1)
+
+    def evaluate_one(self, nutriments):
+        """(warning messages, matches) for a single nutriments dict."""
+        values = np.array([[_as_float(nutriments.get(col)) for col in self.columns]], dtype=np.float64)
+        mask = self.violations(values.reshape(1, len(self.columns)))[0]
+        return list(self.messages[mask]), not mask.any()
+
+
+@lru_cache(maxsize=256)
+def compile_rules(rules):
+    return CompiledRules(rules)
+
+
+def compile_profiles(dietary_preferences, thresholds, profiles=DIET_PROFILES):
+    return compile_rules(profile_rules(dietary_preferences, thresholds, profiles))
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def nutrient_table(products, columns=NUTRIENT_COLUMNS):
+    """Columnar float table (NaN for missing) from a list of OFF product dicts."""
+    nutriments = [p.get("nutriments", {}) or {} for p in products]
+    return pd.DataFrame(
+        {col: np.fromiter((_as_float(n.get(col)) for n in nutriments), dtype=np.float64, count=len(nutriments))
+         for col in columns},
+        index=pd.RangeIndex(len(nutriments))
+    )
+
+
+def _column(table, col, n):
+    if col not in table:
+        return np.full(n, np.nan)
+    values = np.asarray(table[col])
+    if values.dtype.kind in "biuf":
+        return values.astype(np.float64, copy=False)
+    # None, NaN and non-numeric entries all become NaN, and NaN > limit is False
+    return pd.to_numeric(pd.Series(values.astype(object)), errors="coerce").to_numpy(np.float64)
+
+
+def _table_length(table):
+    if isinstance(table, pd.DataFrame):
+        return len(table)
+    return max((len(v) for v in table.values()), default=0)
+
+
+def check_nutrition_warnings_table(table, dietary_preferences, thresholds, profiles=DIET_PROFILES):
+    """Evaluate the selected diet profiles and thresholds for every row of `table`.
+
+    `table` is a DataFrame or a dict of equal-length arrays keyed by OFF
+    nutrient names. Returns (violations, matches_preference): a boolean
+    DataFrame with one column per rule code, and a boolean array that is
+    True where no rule fired.
+    """
+    return compile_profiles(dietary_preferences, thresholds, profiles).evaluate(table)
+
+
+def check_nutrition_warnings(nutriments, dietary_preferences, thresholds, profiles=DIET_PROFILES):
+    """Single-product form: (warning messages, matches_preference)."""
+    return compile_profiles(dietary_preferences, thresholds, profiles).evaluate_one(nutriments)
+
+
+# --- Comparison --------------------------------------------------------------
+
+# OFF nutrient -> comparison column; the first five are better when lower
+COMPARISON_NUTRIENTS = {
+    "energy-kcal_100g": "Calories (kcal)",
+    "fat_100g": "Fat (g)",
+    "saturated-fat_100g": "Sat. fat (g)",
+    "sugars_100g": "Sugars (g)",
+    "salt_100g": "Salt (g)",
+    "proteins_100g": "Protein (g)",
+    "fiber_100g": "Fibre (g)",
+}
+LOWER_IS_BETTER = list(COMPARISON_NUTRIENTS.values())[:5]
+HIGHER_IS_BETTER = list(COMPARISON_NUTRIENTS.values())[5:]
+
+
+def comparison_table(products, compiled, flags=False):
+    """One row per product: identity, grades, nutrients and rule warnings.
+
+    With `flags`, also one boolean column per rule, named by its message.
+    """
+    mask = compiled.violations(compiled.matrix(nutrient_table(products, compiled.columns)))
+    grades = [nutriscore_grade(p)[0] or "" for p in products]
+    frame = pd.DataFrame({
+        "Product": [p.get("product_name", "Unknown") for p in products],
+        "Brand": [p.get("brands", "Unknown") for p in products],
+        "Barcode": [p.get("code", "") for p in products],
+        "Nutri-Score": [g.upper() for g in grades],
+        "Eco-Score": [str(p.get("ecoscore_grade") or "").upper() for p in products],
+    })
+    nutrients = nutrient_table(products, list(COMPARISON_NUTRIENTS)).rename(columns=COMPARISON_NUTRIENTS)
+    frame = pd.concat([frame, nutrients], axis=1)
+    frame["Warnings"] = mask.sum(axis=1)
+    frame["Warning details"] = ["; ".join(compiled.messages[row]) for row in mask]
+    if flags:
+        for message, column in dict(zip(compiled.messages, mask.T)).items():
+            frame[message] = column
+    return frame
+
+
+# --- Ranking -----------------------------------------------------------------
+
+SORT_OPTIONS = [
+    "Relevance (Open Food Facts order)",
+    "Best compliance",
+    "Lowest sugar",
+    "Lowest salt",
+    "Best Nutri-Score",
+    "Composite score",
+]
+
+GRADE_RANK = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4}
+
+
+def off_nutriscore_score(p):
+    """OFF's own Nutri-Score points, or None when it sends none."""
+    score = (p.get("nutriscore_data") or {}).get("score")
+    return p.get("nutriscore_score") if score is None else score
+
+
+def nutriscore_grade(p):
+    """(grade, score, grade estimated, score estimated) for a product.
+
+    OFF's grade is used when OFF graded the product (it sends "unknown"
+    otherwise), else the locally computed one (nutriscore.annotate); grade
+    is None when neither exists. OFF's score comes first; the local score
+    fills in only where the local grade agrees with the grade shown, so an
+    estimate never contradicts it.
+    """
+    local = p.get("nutriscore_local") or {}
+    grade = str(p.get("nutrition_grades") or "").lower()
+    grade_estimated = grade not in GRADE_RANK
+    if grade_estimated:
+        grade = local.get("grade") if local.get("grade") in GRADE_RANK else None
+    score = None if grade_estimated else off_nutriscore_score(p)
+    score_estimated = score is None and grade is not None and local.get("grade") == grade
+    if score_estimated:
+        score = local.get("score")
+    return grade, score, grade_estimated and grade is not None, score_estimated
+
+
+def nutriscore_keys(products):
+    """Nutri-Score sort key per product (lower is better, NaN when unknown).
+
+    The grade letter dominates; the numeric score breaks ties within a grade.
+    """
+    graded = [nutriscore_grade(p) for p in products]
+    grades = np.fromiter((GRADE_RANK.get(g, np.nan) for g, _, _, _ in graded), dtype=np.float64, count=len(products))
+    scores = np.fromiter((_as_float(score) for _, score, _, _ in graded), dtype=np.float64, count=len(products))
+    return grades + np.nan_to_num(scores, nan=0.0) / 1000
+
+
+def compliance_scores(compiled, values):
+    """Number of violated rules plus the summed relative excess over their limits.
+
+    `values` is `compiled.matrix(table)`. Lower is better; a product that
+    breaks one rule by a little ranks above one that breaks it by a lot.
+    """
+    signed = values[:, compiled.column_index] * compiled.sign
+    mask = signed > compiled.signed_limits
+    excess = np.where(mask, (signed - compiled.signed_limits) / np.maximum(np.abs(compiled.signed_limits), 1e-9), 0.0)
+    return mask.sum(axis=1) + np.minimum(excess.sum(axis=1), 0.999)
+
+
+def sort_scores(products, option, compiled):
+    """Score per product for a SORT_OPTIONS entry (lower is better), or None for OFF order."""
+    if option == "Best compliance":
+        return compliance_scores(compiled, compiled.matrix(nutrient_table(products, compiled.columns)))
+    if option == "Lowest sugar":
+        return nutrient_table(products, ["sugars_100g"])["sugars_100g"].to_numpy()
+    if option == "Lowest salt":
+        return nutrient_table(products, ["salt_100g"])["salt_100g"].to_numpy()
+    if option == "Best Nutri-Score":
+        return nutriscore_keys(products)
+    if option == "Composite score":
+        # Violations first, then Nutri-Score (unknown grades count as E)
+        grade = np.nan_to_num(nutriscore_keys(products), nan=4.999) / 5
+        return np.floor(compliance_scores(compiled, compiled.matrix(nutrient_table(products, compiled.columns)))) + grade
+    return None
+
+
+def top_k(scores, k):
+    """Indices of the `k` lowest scores in ascending order, NaN last.
+
+    Uses a linear-time partial selection (`np.partition`) instead of a full
+    sort. Ties keep their original order, so every page boundary is
+    deterministic and page n+1 always continues page n.
+    """
+    scores = np.where(np.isnan(scores), np.inf, np.asarray(scores, dtype=np.float64))
+    n = len(scores)
+    if k >= n:
+        return np.argsort(scores, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    kth = np.partition(scores, k - 1)[k - 1]
+    better = np.flatnonzero(scores < kth)
+    ties = np.flatnonzero(scores == kth)[:k - len(better)]
+    idx = np.concatenate([better, ties])
+    return idx[np.lexsort((idx, scores[idx]))]
+
+
+def rank_products(products, option, compiled, k=None):
+    """Positions of the best `k` products (all when None) for a sort option."""
+    scores = sort_scores(products, option, compiled)
+    if scores is None:
+        return np.arange(len(products) if k is None else min(k, len(products)))
+    return top_k(scores, len(products) if k is None else k)